@@ -1,4 +1,268 @@
-import PySimpleGUI as sg
+import concurrent.futures
+import inspect
+import queue
+import threading
+import time
+
+from Robs_Toolbox2.toolbox import log
+
+try:
+    import PySimpleGUI as sg
+except ImportError:     # WorkerRuntime runs headless against FakeWindow without it
+    sg = None
+
+WIN_CLOSED = None
+TIMEOUT_KEY = sg.TIMEOUT_KEY if sg is not None else '__TIMEOUT__'
+
+
+class WorkerCancelled(Exception):
+    """Raised by WorkerTask.check() once the task is cancelled"""
+
+
+class WorkerTask:
+    """
+    Handle of one handler call on the WorkerRuntime pool.
+    A handler taking a 'task' keyword gets it, to report progress and to stop when cancelled:
+        def pull(values, task):
+            for enum, network in enumerate(networks):
+                task.check()
+                task.progress(enum / len(networks))
+    """
+
+    def __init__(self, runtime: 'WorkerRuntime', key):
+        self.runtime = runtime
+        self.key = key
+        self.future: concurrent.futures.Future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._has_pending = False
+        self._last_sent = 0.0
+        self._timer: threading.Timer = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Ask the task to stop, a queued task ends before calling its handler"""
+        self._cancel.set()
+
+    def check(self) -> None:
+        if self._cancel.is_set():
+            raise WorkerCancelled(self.key)
+
+    def progress(self, value) -> None:
+        """
+        Report progress, sent as a (key, PROGRESS) event. Updates are coalesced: at most one event per
+        progress_interval, carrying the latest value, so tight loops don't flood the GUI thread.
+        """
+        with self._lock:
+            self._pending = value
+            self._has_pending = True
+            if self._timer is not None:
+                return
+            delay = self._last_sent + self.runtime.progress_interval - time.monotonic()
+            if delay > 0:
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Send the pending progress value now"""
+        with self._lock:
+            self._timer = None
+            if not self._has_pending or self.cancelled:
+                return
+            value, self._pending, self._has_pending = self._pending, None, False
+            self._last_sent = time.monotonic()
+        self.runtime.send(self.key, WorkerRuntime.PROGRESS, value)
+
+    def _stop_timer(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class WorkerRuntime:
+    """
+    Runs event handlers on a thread pool so long calls (API pulls, report builds) don't freeze the window.
+    Workers report back through window.write_event_value, which wakes a blocking window.read(),
+    so the event loop needs no read timeout. Events sent, value in values[event]:
+        (key, DONE)         handler return value
+        (key, ERROR)        exception raised by the handler
+        (key, CANCELLED)    None, the task was cancelled
+        (key, PROGRESS)     latest WorkerTask.progress() value, throttled to one per progress_interval
+    Submitting a key that is still running cancels the running task first, the replaced task sends no further
+    events so callbacks only ever hear about the latest task of a key.
+    window can be a PySimpleGUI Window or a FakeWindow for headless use.
+    """
+    DONE = '-DONE-'
+    ERROR = '-ERROR-'
+    CANCELLED = '-CANCELLED-'
+    PROGRESS = '-PROGRESS-'
+    STATES = (DONE, ERROR, CANCELLED, PROGRESS)
+
+    def __init__(self, window, workers: int = 4, progress_interval: float = 0.1):
+        self.window = window
+        self.progress_interval = progress_interval
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='psg-worker')
+        self.tasks: dict = {}   # key -> running WorkerTask
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def send(self, key, state: str, value=None) -> None:
+        try:
+            self.window.write_event_value((key, state), value)
+        except Exception as e:  # window already closed
+            log.debug('Dropped %s event for %s: %r', state, key, e)
+
+    @staticmethod
+    def _takes_task(func) -> bool:
+        try:
+            return 'task' in inspect.signature(func).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def submit(self, key, func, *args, **kwargs) -> WorkerTask:
+        """Run func(*args, **kwargs) on the pool, plus task=WorkerTask when func has a 'task' parameter"""
+        task = WorkerTask(self, key)
+        if self._takes_task(func):
+            kwargs['task'] = task
+        with self._lock:
+            previous = self.tasks.get(key)
+            self.tasks[key] = task
+        if previous is not None:
+            previous.cancel()
+        task.future = self.executor.submit(self._run, task, func, args, kwargs)
+        return task
+
+    def _run(self, task: WorkerTask, func, args: tuple, kwargs: dict) -> None:
+        state, value = None, None
+        try:
+            task.check()
+            result = func(*args, **kwargs)
+            task.check()
+        except WorkerCancelled:
+            state = self.CANCELLED
+        except Exception as e:
+            log.error('Handler for %s failed: %r', task.key, e)
+            state, value = self.ERROR, e
+        else:
+            task._stop_timer()
+            task.flush()
+            state, value = self.DONE, result
+        finally:
+            task._stop_timer()
+            with self._lock:
+                current = self.tasks.get(task.key) is task
+                if current:
+                    del self.tasks[task.key]
+            if state is not None and current:
+                self.send(task.key, state, value)
+            elif state is not None:     # replaced by a newer submit of the same key
+                log.debug('Dropped %s event of superseded task %s', state, task.key)
+
+    def cancel(self, key) -> bool:
+        """Cancel the running task for key, True if there was one"""
+        with self._lock:
+            task = self.tasks.get(key)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.cancel_all()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def dispatch(self, event, values: dict, handlers: dict, callbacks: dict = None) -> bool:
+        """
+        Route one event: worker events to callbacks[key](state, value) on the calling (GUI) thread,
+        GUI events to handlers[event](values) on the pool. Returns True if the event was handled.
+        """
+        if isinstance(event, tuple) and len(event) == 2 and event[1] in self.STATES:
+            callback = (callbacks or {}).get(event[0])
+            if callback is None:
+                return False
+            callback(event[1], values.get(event) if values else None)
+            return True
+        handler = handlers.get(event)
+        if handler is None:
+            return False
+        self.submit(event, handler, values)
+        return True
+
+    def run(self, handlers: dict, callbacks: dict = None, close_events: tuple = (WIN_CLOSED, 'Quit', 'Exit'),
+            on_event=None) -> None:
+        """
+        Event loop: block on window.read() and dispatch until a close event, then cancel running tasks.
+        :param handlers: {event: func(values)} run on the pool, func may take a 'task' keyword
+        :param callbacks: {event: func(state, value)} run on the GUI thread for worker events, e.g. to
+            update elements with the result or progress
+        :param close_events: events ending the loop
+        :param on_event: func(event, values) for events not handled otherwise
+        """
+        try:
+            while True:
+                event, values = self.window.read()
+                if event in close_events:
+                    break
+                if not self.dispatch(event, values, handlers, callbacks) and on_event is not None:
+                    on_event(event, values)
+        finally:
+            self.shutdown()
+
+
+class FakeWindow:
+    """
+    Headless stand-in for sg.Window, enough for WorkerRuntime: events are queued by push() (user events)
+    and write_event_value() (workers), read() blocks until one arrives or the timeout (ms) passes.
+    Every write_event_value call is kept in .sent.
+    """
+
+    def __init__(self, events: list = None):
+        self._events = queue.Queue()
+        self.sent: list = []
+        self.closed = False
+        for event in events or []:
+            if isinstance(event, tuple):
+                self.push(*event)
+            else:
+                self.push(event)
+
+    def push(self, event, values: dict = None) -> None:
+        self._events.put((event, values if values is not None else {}))
+
+    def write_event_value(self, key, value) -> None:
+        if self.closed:
+            raise RuntimeError('window is closed')
+        self.sent.append((key, value))
+        self._events.put((key, {key: value}))
+
+    def read(self, timeout: int = None):
+        try:
+            return self._events.get(timeout=timeout / 1000 if timeout is not None else None)
+        except queue.Empty:
+            return TIMEOUT_KEY, {}
+
+    def close(self) -> None:
+        self.closed = True
+
 
 class PSGTools:
 
@@ -16,9 +280,20 @@ class PSGTools:
         return tuple(location)
 
     @staticmethod
-    def layout_tester(layout: list[list], timeout: int = None):
+    def layout_tester(layout: list[list], timeout: int = None, handlers: dict = None, callbacks: dict = None):
+        """
+        Print every event of layout until closed. With handlers ({event: func(values)}), those events run
+        on a WorkerRuntime pool and their results are printed as they arrive, see WorkerRuntime.run
+        """
+        if sg is None:
+            raise ImportError("PySimpleGUI is required for layout_tester")
         print('Testing')
         window = sg.Window('Testing', layout)
+        if handlers:
+            WorkerRuntime(window).run(handlers, callbacks, on_event=lambda event, values: print(event, values))
+            window.close()
+            print('Testing Complete')
+            return
         while True:
             if timeout is not None:
                 event, values = window.read(timeout=timeout)
@@ -28,4 +303,4 @@ class PSGTools:
                 break
             print(event, values)
         window.close()
-        print('Testing Complete')
\ No newline at end of file
+        print('Testing Complete')
@@ -1,2 +1,45 @@
-from Robs_Toolbox2.toolbox import *
+"""
+Robs_Toolbox2, the public API is imported on first access (PEP 562) so 'import Robs_Toolbox2' stays cheap:
+    from Robs_Toolbox2 import RTB, log          # imports toolbox only
+    Robs_Toolbox2.FileHandlerJSON               # imports filehandler (and yaml) when first used
+Submodules (toolbox, filehandler, xlsx, requesthelper, GUITools, ...) can still be imported directly.
+"""
+import importlib
 
+_LAZY = {
+    'toolbox': ('CRITICAL', 'DEBUG', 'ERROR', 'INFO', 'WARN', 'log', 'log_format', 'setup_logger', 'pp',
+                'my_time', 'my_async_time', 'run_in_loop', 'fan_out', 'fan_out_async', 'fan_out_gather',
+                'FanOutTask', 'FanOutError', 'FanOutResult', 'EnvironmentTools', 'StringTools', 'IPv4Tools',
+                'MacTools', 'OUIIndex', 'IndexedRecords', 'RecordFilter', 'DataHandler', 'RTB'),
+    'profiling': ('profiler', 'span'),
+    'filehandler': ('FileHandler', 'FileHandlerJSON', 'FileHandlerYAML', 'FileHandlerJSONL', 'FileHandlerColumnar',
+                    'SnapshotStore', 'get_config_yaml', 'get_yaml_creds'),
+    'xlsx': ('SingleReport',),
+    'requesthelper': ('RequestHelper', 'AsyncRequestHelper', 'BatchResult'),
+    'GUITools': ('PSGTools', 'WorkerRuntime', 'FakeWindow'),
+}
+_ATTRIBUTES = {name: module for module, names in _LAZY.items() for name in names}
+_SUBMODULES = ('toolbox', 'profiling', 'filehandler', 'xlsx', 'requesthelper', 'logtools', 'GUITools', 'benchmarks')
+# modules the old 'from .toolbox import *' re-exported, logzero is only imported when asked for
+_REEXPORTED_MODULES = ('datetime', 're', 'time', 'os', 'functools', 'pprint', 'logzero')
+
+# 'from Robs_Toolbox2 import *' keeps exporting the toolbox API, like the old 'from .toolbox import *'
+__all__ = list(_LAZY['toolbox']) + list(_LAZY['profiling']) + list(_REEXPORTED_MODULES)
+
+
+def __getattr__(name: str):
+    module = _ATTRIBUTES.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(f'{__name__}.{module}'), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'{__name__}.{name}')
+    elif name in _REEXPORTED_MODULES:
+        value = importlib.import_module(name)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_ATTRIBUTES) | set(_SUBMODULES))
@@ -0,0 +1,406 @@
+"""
+Benchmarks for toolbox hot paths.
+Run all:  python -m Robs_Toolbox2.benchmarks
+Run some: python -m Robs_Toolbox2.benchmarks yaml
+Suite on seeded data, saved and compared against an earlier run:
+    python -m Robs_Toolbox2.benchmarks suite --scale 100k --output run.json --baseline baseline.json
+"""
+import argparse
+import datetime
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+
+def timed(func, *args, repeat: int = 3, **kwargs) -> float:
+    """Best of 'repeat' runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - tic
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_row(*columns, widths=(28, 12, 12, 12)):
+    print(''.join(f'{str(col):<{width}}' for col, width in zip(columns, widths)))
+
+
+def make_devices(count: int) -> list[dict]:
+    return [{'serial': f'Q2XX-{i:04X}-{i * 7 % 65536:04X}',
+             'name': f'device-{i}',
+             'model': ('MS220-8P', 'MR33', 'MX67')[i % 3],
+             'lanIp': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+             'tags': ['store', f'region-{i % 9}'],
+             'networkId': f'L_{i // 50}'} for i in range(count)]
+
+
+def make_ips(count: int, seed: int = 0, invalid: float = 0.02) -> list[str]:
+    """Random IPv4 strings, 'invalid' fraction of them malformed"""
+    rng = random.Random(seed)
+    bad = ('300.1.1.1', '10.0.0', 'host.example', '1.2.3.4.5', '')
+    return [rng.choice(bad) if rng.random() < invalid else
+            f'{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}'
+            for _ in range(count)]
+
+
+def make_macs(count: int, seed: int = 0) -> list[str]:
+    """Random MACs in mixed notations: aa:bb:.., AA-BB-.., aabb.ccdd.eeff and bare"""
+    rng = random.Random(seed)
+    macs = []
+    for _ in range(count):
+        raw = f'{rng.getrandbits(48):012x}'
+        style = rng.randrange(4)
+        if style == 0:
+            macs.append(':'.join(raw[i:i + 2] for i in range(0, 12, 2)))
+        elif style == 1:
+            macs.append('-'.join(raw[i:i + 2] for i in range(0, 12, 2)).upper())
+        elif style == 2:
+            macs.append('.'.join(raw[i:i + 4] for i in range(0, 12, 4)))
+        else:
+            macs.append(raw)
+    return macs
+
+
+def make_inventory(count: int, seed: int = 0) -> list[dict]:
+    """Seeded nested device dicts shaped like a dashboard inventory"""
+    rng = random.Random(seed)
+    models = ('MS220-8P', 'MS250-48', 'MR33', 'MR46', 'MX67', 'MX250', 'MV12')
+    start = datetime.datetime(2024, 1, 1)
+    devices = []
+    for i in range(count):
+        model = rng.choice(models)
+        devices.append({
+            'serial': f'Q2{rng.choice("ABCDEFGH")}{rng.randrange(16)}-{rng.getrandbits(16):04X}-{i & 0xFFFF:04X}',
+            'name': f'{model.lower()}-store{i // 25:05d}-{i % 25}',
+            'model': model,
+            'mac': ':'.join(f'{rng.randrange(256):02x}' for _ in range(6)),
+            'lanIp': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+            'networkId': f'L_{646829496481 + i // 25}',
+            'firmware': f'{model[:2].lower()}-{rng.choice((15, 16, 17))}-{rng.randrange(10)}',
+            'tags': rng.sample(('store', 'pharmacy', 'fuel', 'warehouse', 'office', 'lab'), rng.randrange(1, 4)),
+            'status': rng.choices(('online', 'offline', 'alerting', 'dormant'), (90, 5, 4, 1))[0],
+            'lastReportedAt': str(start + datetime.timedelta(seconds=rng.randrange(20_000_000))),
+            'location': {'lat': round(rng.uniform(40, 44), 6), 'lng': round(rng.uniform(-96, -90), 6),
+                         'address': f'{rng.randrange(1, 9999)} Main St'},
+            'ports': [{'portId': str(port), 'enabled': rng.random() < 0.9, 'vlan': rng.choice((1, 10, 20, 100))}
+                      for port in range(1, 5)] if model.startswith('MS') else [],
+        })
+    return devices
+
+
+def bench_yaml(sizes: tuple = (100, 1_000, 10_000)):
+    """Pure Python SafeLoader/SafeDumper vs libyaml CSafeLoader/CSafeDumper"""
+    backends = [('python', yaml.SafeLoader, yaml.SafeDumper)]
+    if getattr(yaml, '__with_libyaml__', False):
+        backends.append(('libyaml', yaml.CSafeLoader, yaml.CSafeDumper))
+    else:
+        print('libyaml not available, only the pure Python backend is measured')
+    print_row('yaml', 'records', 'dump s', 'load s')
+    for size in sizes:
+        data = {'fname': 'bench.yml', 'comment': '', 'date': '', 'data': make_devices(size)}
+        repeat = 3 if size <= 1_000 else 1
+        for name, loader, dumper in backends:
+            text = yaml.dump(data, Dumper=dumper)
+            dump_s = timed(yaml.dump, data, Dumper=dumper, repeat=repeat)
+            load_s = timed(yaml.load, text, Loader=loader, repeat=repeat)
+            print_row(name, size, f'{dump_s:0.4f}', f'{load_s:0.4f}')
+
+
+def bench_compression(size: int = 50_000):
+    """FileHandlerJSON save/load throughput (MB/s of uncompressed JSON) and size per compression extension"""
+    from Robs_Toolbox2.filehandler import FileHandlerJSON, _optional
+    codecs = [('none', ''), ('gzip', '.gz')]
+    codecs += [('zstd', '.zst')] if _optional('zstandard') is not None else []
+    codecs += [('lz4', '.lz4')] if _optional('lz4') is not None else []
+    data = make_devices(size)
+    handler = FileHandlerJSON(compact=True)
+    print_row('codec', 'save MB/s', 'load MB/s', 'ratio')
+    with tempfile.TemporaryDirectory() as directory:
+        plain = None
+        for name, suffix in codecs:
+            filename = os.path.join(directory, f'bench.json{suffix}')
+            save_s = timed(handler.save_data_to_file, data, filename)
+            load_s = timed(handler.load_list_from_file, filename)
+            stored = os.path.getsize(filename)
+            plain = plain or stored
+            megabytes = plain / 1e6
+            print_row(name, f'{megabytes / save_s:0.1f}', f'{megabytes / load_s:0.1f}', f'{plain / stored:0.2f}')
+
+
+def bench_load_many(files: int = 16, size: int = 2_000):
+    """Serial load_list_from_file vs FileHandler.load_many with thread and process pools"""
+    from Robs_Toolbox2.filehandler import FileHandlerJSON, FileHandlerYAML
+    print_row('handler', 'mode', 'load s', 'records')
+    with tempfile.TemporaryDirectory() as directory:
+        for handler in (FileHandlerJSON(compact=True), FileHandlerYAML()):
+            paths = [os.path.join(directory, f'network_{i}') for i in range(files)]
+            for path in paths:
+                handler.save_data_to_file(make_devices(size), path)
+            name = type(handler).__name__
+            serial_s = timed(lambda: [handler.load_list_from_file(path) for path in paths], repeat=1)
+            print_row(name, 'serial', f'{serial_s:0.3f}', files * size)
+            for mode in ('thread', 'process'):
+                merged = None
+
+                def run():
+                    nonlocal merged
+                    merged = handler.load_many(paths, mode=mode, merge=True)
+                load_s = timed(run, repeat=1)
+                print_row(name, mode, f'{load_s:0.3f}', len(merged.data))
+
+
+def bench_filter(size: int = 100_000):
+    """Compiled RecordFilter vs the per item re.findall loop and chained search_* calls"""
+    import re
+    from Robs_Toolbox2.toolbox import RTB, RecordFilter
+    devices = make_devices(size)
+    parameters = {'model': 'MX', 'name': 'device-1'}
+
+    def findall_loop():     # search_list_of_dicts_for_string_by_dict before RecordFilter
+        output = []
+        for item in devices:
+            for k, v in parameters.items():
+                if re.findall(v, RTB.xstr(item[k], '')):
+                    output.append(item)
+        return output
+
+    def chained():
+        models = RTB.search_list_of_dicts_for_string_using_in(devices, 'MX', 'model')
+        return RTB.search_list_of_dicts_for_str_using_re(models, '^device-1', 'name')
+
+    any_filter = RecordFilter({'or': [{'model': {'regex': 'MX'}}, {'name': {'regex': 'device-1'}}]})
+    all_filter = RecordFilter({'model': {'contains': 'MX'}, 'name': re.compile('^device-1')})
+    print_row('search', 'matches', 'seconds')
+    for name, func in (('findall loop (or)', findall_loop),
+                       ('RecordFilter (or)', lambda: list(any_filter.filter(devices))),
+                       ('chained search_* (and)', chained),
+                       ('RecordFilter (and)', lambda: list(all_filter.filter(devices))),
+                       ('compile + first match', lambda: RecordFilter({'model': 'MX67'}).first(devices))):
+        result = func()
+        print_row(name, len(result) if isinstance(result, list) else 1, f'{timed(func):0.4f}')
+
+
+def bench_join(sizes: tuple = (1_000, 5_000)):
+    """hash_join/group_by/dedupe_by vs nested search_* loops correlating devices and networks"""
+    from Robs_Toolbox2.toolbox import RTB
+    print_row('operation', 'devices', 'nested s', 'hashed s')
+    for size in sizes:
+        devices = make_devices(size)
+        networks = [{'id': f'L_{i}', 'name': f'network-{i}'} for i in range(size // 50 + 1)]
+
+        search = RTB.search_list_of_dicts_for_value_using_equality
+
+        def nested_join():
+            return [{**device, **network} for device in devices
+                    for network in search(networks, device['networkId'], 'id')]
+
+        def nested_group():
+            return {network['id']: search(devices, network['id'], 'networkId') for network in networks}
+
+        def nested_dedupe():
+            output = []
+            for device in devices + devices:
+                if not search(output, device['serial'], 'serial'):
+                    output.append(device)
+            return output
+
+        repeat = 3 if size <= 1_000 else 1
+        for name, nested, hashed in (
+                ('hash_join', nested_join, lambda: list(RTB.hash_join(devices, networks, 'networkId', 'id'))),
+                ('group_by', nested_group, lambda: RTB.group_by(devices, 'networkId')),
+                ('dedupe_by', nested_dedupe, lambda: list(RTB.dedupe_by(devices + devices, 'serial')))):
+            print_row(name, size, f'{timed(nested, repeat=repeat):0.4f}', f'{timed(hashed, repeat=repeat):0.4f}')
+
+
+# Import budgets in ms (cumulative -X importtime of the module itself, best of runs), over budget is flagged
+IMPORT_BUDGETS = {
+    'Robs_Toolbox2': 5,
+    'Robs_Toolbox2.toolbox': 75,
+    'Robs_Toolbox2.filehandler': 130,
+    'Robs_Toolbox2.xlsx': 80,
+    'Robs_Toolbox2.requesthelper': 300,
+}
+
+
+def import_time(module: str) -> float:
+    """Milliseconds to import module in a fresh interpreter, from python -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    total = 0
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line.split('|')
+        if name.startswith('  '):   # nested import, already in its parent's cumulative time
+            continue
+        if started:
+            total += int(cumulative)
+        started = started or name.strip() == 'site'
+    return total / 1000
+
+
+def bench_import(runs: int = 5):
+    """Cold import time per module in a fresh interpreter, flags modules over IMPORT_BUDGETS"""
+    print_row('module', 'ms', 'budget ms', '')
+    for module, budget in IMPORT_BUDGETS.items():
+        try:
+            best = min(import_time(module) for _ in range(runs))
+        except subprocess.CalledProcessError as e:
+            print_row(module, 'failed', budget, e.stderr.strip().splitlines()[-1])
+            continue
+        print_row(module, f'{best:0.1f}', budget, 'REGRESSION' if best > budget else '')
+
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+YAML_MAX_RECORDS = 100_000  # pure YAML save/load of 1M nested records takes many minutes, capped
+
+
+def suite_cases(size: int, seed: int, directory: str) -> dict[str, tuple]:
+    """{case name: (function, records processed)} on seeded data of 'size' records"""
+    from Robs_Toolbox2.toolbox import RTB
+    from Robs_Toolbox2.filehandler import FileHandlerJSON, FileHandlerYAML
+    from Robs_Toolbox2.xlsx import SingleReport
+    ips = make_ips(size, seed)
+    macs = make_macs(size, seed)
+    devices = make_inventory(size, seed)
+    dates = [device['lastReportedAt'] for device in devices]
+    last = devices[-1]
+    json_handler, yaml_handler = FileHandlerJSON(), FileHandlerYAML()
+    json_file, yaml_file = os.path.join(directory, 'suite.json'), os.path.join(directory, 'suite.yml')
+    yaml_devices = devices[:YAML_MAX_RECORDS]
+    report_format = {column: {} for column in ('serial', 'name', 'model', 'mac', 'lanIp', 'status', 'tags')}
+
+    def report():
+        SingleReport(filename=os.path.join(directory, 'suite'), output_format=report_format, results=devices,
+                     dated=False).save()
+
+    cases = {
+        'StringTools.sort_ipv4_addresses': (lambda: RTB.sort_ipv4_addresses(ips), size),
+        'StringTools.is_ipv4_address': (lambda: [RTB.is_ipv4_address(ip) for ip in ips], size),
+        'StringTools.convert_mac': (lambda: [RTB.convert_mac(mac) for mac in macs], size),
+        'StringTools.convert_str_to_datetime': (lambda: [RTB.convert_str_to_datetime(date) for date in dates], size),
+        'DataHandler.search_using_next': (
+            lambda: RTB.search_list_of_dicts_for_value_using_next(devices, last['serial'], 'serial'), size),
+        'DataHandler.search_str_using_re': (
+            lambda: RTB.search_list_of_dicts_for_str_using_re(devices, r'^mx\d+-store0000', 'name'), size),
+        'DataHandler.search_string_by_dict': (
+            lambda: RTB.search_list_of_dicts_for_string_by_dict(devices, {'model': '^MX', 'status': 'alerting'}), size),
+        'DataHandler.search_string_using_in': (
+            lambda: RTB.search_list_of_dicts_for_string_using_in(devices, 'store0001', 'name'), size),
+        'DataHandler.search_value_using_equality': (
+            lambda: RTB.search_list_of_dicts_for_value_using_equality(devices, 'MR33', 'model'), size),
+        'FileHandlerJSON.save': (lambda: json_handler.save_data_to_file(devices, json_file), size),
+        'FileHandlerJSON.load': (lambda: json_handler.load_list_from_file(json_file), size),
+        'FileHandlerYAML.save': (lambda: yaml_handler.save_data_to_file(yaml_devices, yaml_file), len(yaml_devices)),
+        'FileHandlerYAML.load': (lambda: yaml_handler.load_list_from_file(yaml_file), len(yaml_devices)),
+        'SingleReport.save': (report, size),
+    }
+    return cases
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Cases slower than threshold x their baseline time"""
+    regressions = []
+    print_row('case', 'seconds', 'baseline', 'ratio', widths=(42, 12, 12, 12))
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            print_row(case, f"{result['seconds']:0.4f}", '-', 'new', widths=(42, 12, 12, 12))
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        flag = 'REGRESSION' if ratio > threshold else ('faster' if ratio < 1 / threshold else '')
+        if flag == 'REGRESSION':
+            regressions.append(case)
+        print_row(case, f"{result['seconds']:0.4f}", f"{base['seconds']:0.4f}", f'{ratio:0.2f} {flag}',
+                  widths=(42, 12, 12, 12))
+    return regressions
+
+
+def bench_suite(scale: str = '1k', seed: int = 0, output: str = None, baseline: str = None,
+                threshold: float = 1.25, cases: list[str] = None) -> list[str]:
+    """
+    Time the toolbox, filehandler and xlsx hot paths on seeded synthetic data.
+    :param scale: '1k', '100k' or '1m' records
+    :param seed: generator seed, the same seed and scale always produce the same data
+    :param output: save results as JSON (FileHandlerJSON envelope) for later comparison
+    :param baseline: earlier output to compare against
+    :param threshold: slower than threshold x baseline is flagged as a regression
+    :param cases: only run case names containing one of these strings
+    :return: names of regressed cases
+    """
+    from Robs_Toolbox2.filehandler import FileHandlerJSON
+    size = SCALES[scale]
+    repeat = 5 if size <= 1_000 else 3 if size <= 100_000 else 1
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'generating {size} records, seed {seed}')
+        for case, (func, records) in suite_cases(size, seed, directory).items():
+            if cases and not any(part in case for part in cases):
+                continue
+            seconds = timed(func, repeat=repeat)
+            results[case] = {'seconds': seconds, 'records': records, 'per_second': records / seconds}
+            print_row(case, f'{seconds:0.4f}', f'{records / seconds:,.0f}/s', widths=(42, 12, 16))
+    run = {'meta': {'scale': scale, 'size': size, 'seed': seed, 'repeat': repeat,
+                    'python': platform.python_version(), 'platform': platform.platform(),
+                    'date': datetime.datetime.now().isoformat(timespec='seconds')},
+           'results': results}
+    if output:
+        FileHandlerJSON().save_data_to_file(run, output, comment='benchmark suite')
+    if not baseline:
+        return []
+    previous = FileHandlerJSON().load_dict_from_file(baseline)
+    if previous.get('meta', {}).get('scale') != scale:
+        print(f"baseline scale {previous.get('meta', {}).get('scale')} differs from {scale}, ratios are meaningless")
+    print()
+    regressions = compare_results(results, previous.get('results', {}), threshold)
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+    return regressions
+
+
+BENCHMARKS = {
+    'yaml': bench_yaml,
+    'compression': bench_compression,
+    'load_many': bench_load_many,
+    'filter': bench_filter,
+    'join': bench_join,
+    'import': bench_import,
+    'suite': bench_suite,
+}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m Robs_Toolbox2.benchmarks')
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run, default all: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--scale', default='1k', choices=list(SCALES), help='suite data size')
+    parser.add_argument('--seed', type=int, default=0, help='suite data seed')
+    parser.add_argument('--output', help='save suite results to this JSON file')
+    parser.add_argument('--baseline', help='compare suite results with this earlier output')
+    parser.add_argument('--threshold', type=float, default=1.25, help='suite regression ratio')
+    parser.add_argument('--case', action='append', help='only suite cases containing this, repeatable')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s) {', '.join(unknown)}, choose from {', '.join(BENCHMARKS)}")
+    regressions = []
+    for name in args.names or list(BENCHMARKS):
+        print(f'\n## {name}')
+        if name == 'suite':
+            regressions = bench_suite(scale=args.scale, seed=args.seed, output=args.output, baseline=args.baseline,
+                                      threshold=args.threshold, cases=args.case)
+        else:
+            BENCHMARKS[name]()
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
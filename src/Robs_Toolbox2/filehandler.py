@@ -1,33 +1,278 @@
+import array
+import bisect
+import contextlib
+import copy
 import datetime
+import glob
+import gzip
+import hashlib
+import importlib
+import io
+import itertools
 import json
-import yaml
+import mmap
+import stat
+import struct
+import sys
+import threading
+import time
 import os.path
 from abc import ABC, abstractmethod
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import NamedTuple
 
-from Robs_Toolbox2.toolbox import RTB, log, pp
+from Robs_Toolbox2.toolbox import RTB, fan_out, log, pp
 
+# yaml and the optional JSON backends / codecs are imported on first use, not at import, see _optional and _yaml.
+# Until then these globals are None
+yaml = YAMLLoader = YAMLDumper = None
+orjson = msgspec = zstandard = lz4 = None
 
-def get_yaml_creds(filename: str = 'credentials.yml', cred_key: str = 'MyCreds'):
-    # print(filename, os.path.exists(filename))
-    # print(os.path.dirname(os.path.realpath(__file__)))
+_OPTIONAL = {'orjson': 'orjson', 'msgspec': 'msgspec', 'zstandard': 'zstandard', 'lz4': 'lz4.frame'}
+_optional_checked: dict = {}    # name -> module or None, for names already tried
+
+
+def _optional(name: str):
+    """Import an optional dependency once, sets the module global of the same name. None if not installed"""
+    if name not in _optional_checked:
+        try:
+            importlib.import_module(_OPTIONAL[name])
+            module = importlib.import_module(name)
+        except ImportError:
+            module = None
+        globals()[name] = module
+        _optional_checked[name] = module
+    return _optional_checked[name]
+
+
+def _yaml():
+    """Import yaml on first use, with the libyaml CSafeLoader/CSafeDumper when available"""
+    global yaml, YAMLLoader, YAMLDumper
+    if yaml is None:
+        import yaml as module
+        YAMLLoader = getattr(module, 'CSafeLoader', module.SafeLoader)
+        YAMLDumper = getattr(module, 'CSafeDumper', module.SafeDumper)
+        yaml = module
+    return yaml
+
+
+class JSONBackend:
+    """
+    JSON serializer used by FileHandlerJSON. dumps() returns bytes, loads() takes bytes.
+    indent=True writes the same 2 space layout as json.dump(indent=2), indent=False writes compact JSON.
+    """
+    name = 'json'
+
+    @staticmethod
+    def dumps(data, indent: bool = True) -> bytes:
+        if indent:
+            return json.dumps(data, indent=2).encode('utf-8')
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def loads(raw: bytes):
+        return json.loads(raw)
+
+
+class OrjsonBackend(JSONBackend):
+    name = 'orjson'
+
+    @staticmethod
+    def dumps(data, indent: bool = True) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+
+    @staticmethod
+    def loads(raw: bytes):
+        return orjson.loads(raw)
+
+
+class MsgspecBackend(JSONBackend):
+    name = 'msgspec'
+
+    @staticmethod
+    def dumps(data, indent: bool = True) -> bytes:
+        raw = msgspec.json.encode(data)
+        return msgspec.json.format(raw, indent=2) if indent else raw
+
+    @staticmethod
+    def loads(raw: bytes):
+        return msgspec.json.decode(raw)
+
+
+# Installed backends in preferred order, first is the default. Filled by get_json_backend on first use
+JSON_BACKENDS: dict = {}
+
+
+def get_json_backend(name: str = None) -> type[JSONBackend]:
+    """Return JSON backend by name, or the fastest installed one"""
+    if not JSON_BACKENDS:
+        for backend in (OrjsonBackend, MsgspecBackend):
+            if _optional(backend.name) is not None:
+                JSON_BACKENDS.setdefault(backend.name, backend)
+        JSON_BACKENDS.setdefault(JSONBackend.name, JSONBackend)
+    if name is None:
+        return next(iter(JSON_BACKENDS.values()))
+    try:
+        return JSON_BACKENDS[name]
+    except KeyError:
+        log.warning("JSON backend '%s' not available, using '%s'", name, JSONBackend.name)
+        return JSONBackend
+
+
+class ConfigCache:
+    """
+    Process wide, thread safe cache of parsed YAML files keyed by absolute path.
+    An entry is re-parsed when the file's mtime or size changes. With watch() running, a background thread
+    does the checking and reads are plain dictionary lookups.
+    Returned objects are shared between callers, treat them as read only. get_config_yaml and get_yaml_creds
+    hand out copies.
+    """
+
+    def __init__(self):
+        self._entries: dict = {}    # path -> (mtime_ns, size, data)
+        self._lock = threading.RLock()
+        self._watcher: threading.Thread or None = None
+        self._stop = threading.Event()
+        self._callbacks: list = []
+
+    @staticmethod
+    def _key(filename: str) -> str:
+        return os.path.abspath(filename)
+
+    @staticmethod
+    def _parse(path: str):
+        with open(path, 'r') as f:
+            return _yaml().load(f, Loader=YAMLLoader)
+
+    def _refresh(self, path: str) -> tuple[bool, object]:
+        """(changed, data) for path, re-parsing only if the file changed"""
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                return False, entry[2]
+            data = self._parse(path)
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+            log.debug("Parsed config '%s'", path)
+            return entry is not None, data
+
+    def load(self, filename: str):
+        path = self._key(filename)
+        if self.watching:
+            entry = self._entries.get(path)
+            if entry is not None:
+                return entry[2]
+        return self._refresh(path)[1]
+
+    def get_key(self, filename: str, key: str, default=None):
+        data = self.load(filename)
+        return data.get(key, default) if isinstance(data, dict) else default
+
+    def view(self, filename: str, key: str) -> 'ConfigView':
+        return ConfigView(self, filename, key)
+
+    def invalidate(self, filename: str = None) -> None:
+        """Drop one file, or everything, from the cache"""
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(filename), None)
+
+    @property
+    def watching(self) -> bool:
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def watch(self, interval: float = 1.0, callback=None) -> None:
+        """
+        Start hot reload: poll cached files every 'interval' seconds and re-parse on change.
+        callback(path, data) is called after a file is reloaded.
+        """
+        if callback is not None:
+            self._callbacks.append(callback)
+        if self.watching:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), name='ConfigCache', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        self._watcher = None
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            for path in list(self._entries):
+                try:
+                    changed, data = self._refresh(path)
+                except (OSError, _yaml().YAMLError) as e:
+                    log.warning("Unable to reload config '%s' : %s", path, e)
+                    continue
+                if changed:
+                    log.info("Reloaded config '%s'", path)
+                    for callback in self._callbacks:
+                        callback(path, data)
+
+
+class ConfigView(Mapping):
+    """Read only view of a single top level key of a cached YAML file, parsed on first access"""
+
+    def __init__(self, cache: ConfigCache, filename: str, key: str):
+        self.cache = cache
+        self.filename = filename
+        self.key = key
+
+    @property
+    def value(self) -> dict:
+        return self.cache.get_key(self.filename, self.key, {})
+
+    def __getitem__(self, item):
+        return self.value[item]
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.filename!r}, {self.key!r})"
+
+
+config_cache = ConfigCache()
+
+
+def get_yaml_creds(filename: str = 'credentials.yml', cred_key: str = 'MyCreds', cached: bool = True):
+    """cached: skip re-parsing an unchanged file, the caller still gets its own copy"""
+    if cached:
+        return copy.deepcopy(config_cache.get_key(filename, cred_key, {}))
     with open(filename, 'r') as f:
-        return yaml.safe_load(f).get(cred_key, {})
+        return _yaml().load(f, Loader=YAMLLoader).get(cred_key, {})
 
 
-def get_config_yaml(filename: str = 'config.yml'):
-    # print(filename, os.path.exists(filename))
-    # print(os.path.dirname(os.path.realpath(__file__)))
+def get_config_yaml(filename: str = 'config.yml', cached: bool = True):
+    """cached: skip re-parsing an unchanged file, the caller still gets its own copy"""
+    if cached:
+        return copy.deepcopy(config_cache.load(filename))
     with open(filename, 'r') as f:
-        return yaml.safe_load(f)
+        return _yaml().load(f, Loader=YAMLLoader)
 
 
 def check_required_files(filelist: dict):
     for key, file in filelist.items():
         if not os.path.exists(file):
             if file.endswith('.json'):
-                FileHandlerJSON.save_data_to_file([], filename=file)
+                FileHandlerJSON().save_data_to_file([], filename=file)
             if file.endswith('.yml'):
-                FileHandlerYAML.save_data_to_file([], filename=file)
+                FileHandlerYAML().save_data_to_file([], filename=file)
+            if file.endswith('.jsonl'):
+                FileHandlerJSONL().save_data_to_file([], filename=file)
 
 
 def check_required_directory(outfolder: str = './_Newfolder', create_folder: bool = False) -> bool:
@@ -38,26 +283,29 @@ def check_required_directory(outfolder: str = './_Newfolder', create_folder: boo
     :return:
     """
     if os.path.isdir(outfolder):
-        log.debug(f"Folder '{outfolder}' already exists.")
+        log.debug("Folder '%s' already exists.", outfolder)
         return True
     else:
-        log.debug(f"Folder '{outfolder}' does not exist.")
+        log.debug("Folder '%s' does not exist.", outfolder)
         if create_folder:
             try:
                 os.mkdir(outfolder)
-                log.debug(f"Folder '{outfolder}' created.")
+                log.debug("Folder '%s' created.", outfolder)
                 return True
             except Exception as e:
-                log.warning(f"Unable to create directory '{outfolder}' : {e}")
+                log.warning("Unable to create directory '%s' : %s", outfolder, e)
                 return False
 
 
-def check_structure(config, config_loc: str = 'DIRECTORY', parent_directory: str = None):
+def check_structure(config: dict or str, config_loc: str = 'DIRECTORY', parent_directory: str = None):
     """
+    config: config dict, or path of the config file (read through config_cache)
     config_loc: keyword name for folder structure config
     parent_directory: build a parent directory to put all of structure into
         - used by meraki tools to allow multiple org ids.
     """
+    if isinstance(config, str):
+        config = config_cache.load(config)
     pdir = ""
     if parent_directory:
         check_required_directory(outfolder=parent_directory, create_folder=True)
@@ -67,11 +315,175 @@ def check_structure(config, config_loc: str = 'DIRECTORY', parent_directory: str
         check_required_directory(outfolder=folder_name, create_folder=True)
 
 
+# Compression is chosen by the last extension, e.g. 'snapshot.json.zst'
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd', '.lz4': 'lz4'}
+
+def split_compression(filename: str) -> tuple[str, str]:
+    """'a.json.zst' -> ('a.json', '.zst'), 'a.json' -> ('a.json', '')"""
+    root, ext = os.path.splitext(filename)
+    if ext in COMPRESSION_EXTENSIONS:
+        return root, ext
+    return filename, ''
+
+
+def _codec(filename: str) -> str or None:
+    codec = COMPRESSION_EXTENSIONS.get(split_compression(filename)[1])
+    if codec == 'zstd' and _optional('zstandard') is None:
+        raise ImportError(f"'zstandard' is required for '{filename}'")
+    if codec == 'lz4' and _optional('lz4') is None:
+        raise ImportError(f"'lz4' is required for '{filename}'")
+    return codec
+
+
+def _compressed_writer(raw, codec: str):
+    """Binary writer compressing into raw, closing it finishes the stream but leaves raw open"""
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return lz4.frame.LZ4FrameFile(raw, mode='wb')
+
+
+@contextlib.contextmanager
+def atomic_write(filename: str, text: bool = False, fsync: bool = True):
+    """
+    Write filename crash safe: data goes to a temp file in the same directory, which is fsync'd and then
+    os.replace'd over filename, so readers see either the old or the new file, never a partial one.
+    Compressed by extension (.gz, .zst, .lz4). A replaced file keeps its permissions, a new one gets the
+    usual 0o666 minus umask.
+    """
+    codec = _codec(filename)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = _create_temp(directory, os.path.basename(filename))
+    try:
+        with contextlib.suppress(FileNotFoundError):
+            os.chmod(tmp, stat.S_IMODE(os.stat(filename).st_mode))
+        with os.fdopen(fd, 'wb') as raw:
+            stream = _compressed_writer(raw, codec) if codec else raw
+            f = io.TextIOWrapper(stream, encoding='utf-8') if text else stream
+            yield f
+            if text:
+                f.flush()
+                f.detach()
+            if stream is not raw:
+                stream.close()
+            raw.flush()
+            if fsync:
+                os.fsync(raw.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    if fsync:
+        _fsync_directory(directory)
+
+
+def _create_temp(directory: str, basename: str) -> tuple[int, str]:
+    """
+    (fd, path) of a new temp file next to the target. Unlike tempfile.mkstemp (always 0o600) it is created
+    0o666, so the kernel applies the process umask without the umask having to be read (and reset) first.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        tmp = os.path.join(directory, f'.{basename}.{os.urandom(4).hex()}.tmp')
+        try:
+            return os.open(tmp, flags, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def _fsync_directory(directory: str) -> None:
+    """Persist the rename, not possible on every platform"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def open_read(filename: str, text: bool = False):
+    """Open for reading, decompressing on the fly by extension"""
+    codec = _codec(filename)
+    if codec == 'gzip':
+        stream = gzip.open(filename, 'rb')
+    elif codec == 'zstd':
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(filename, 'rb'), read_across_frames=True, closefd=True))
+    elif codec == 'lz4':
+        stream = lz4.frame.open(filename, 'rb')
+    else:
+        return open(filename, 'r', encoding='utf-8') if text else open(filename, 'rb')
+    return io.TextIOWrapper(stream, encoding='utf-8') if text else stream
+
+
+def open_append(filename: str):
+    """Open for appending, compressed files get a new frame/member which readers join transparently"""
+    codec = _codec(filename)
+    if codec == 'gzip':
+        return gzip.open(filename, 'ab')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(filename, 'ab'), closefd=True)
+    if codec == 'lz4':
+        return lz4.frame.open(filename, 'ab')
+    return open(filename, 'ab')
+
+
+class LoadedFile(NamedTuple):
+    """Outcome of loading one file with FileHandler.load_many, seconds is the load time in the worker"""
+    filename: str
+    data: object = None
+    seconds: float = 0.0
+    error: BaseException = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class MergedLoad(NamedTuple):
+    """load_many(merge=True): lists concatenated or dicts updated in path order, plus every LoadedFile"""
+    data: list or dict
+    files: list[LoadedFile]
+
+    @property
+    def errors(self) -> list[LoadedFile]:
+        return [loaded for loaded in self.files if not loaded.ok]
+
+
+def _load_file(job: tuple) -> LoadedFile:
+    """load_many worker, module level so process pools can pickle it"""
+    handler, filename, data_only = job
+    tic = time.perf_counter()
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"File '{filename}' Not Found")
+    data = handler.load_file(filename, data_only=data_only)
+    return LoadedFile(filename, data, time.perf_counter() - tic)
+
+
 class FileHandler(ABC):
     extension = ''
+    parallel_mode = 'process'   # load_many pool, 'thread' where results can't be pickled or parsing is cheap
 
     def check_filename(self, filename):
-        return filename if filename.endswith(self.extension) else filename + self.extension
+        """Add the handler extension, keeping a compression extension last: 'a.zst' -> 'a.json.zst'"""
+        filename, compression = split_compression(filename)
+        filename = filename if filename.endswith(self.extension) else filename + self.extension
+        return filename + compression
+
+    @staticmethod
+    def open_write(filename: str, text: bool = False):
+        """Atomic (and compressed by extension) write, see atomic_write"""
+        return atomic_write(filename, text=text)
+
+    @staticmethod
+    def open_read(filename: str, text: bool = False):
+        return open_read(filename, text=text)
 
     def date_filename(self, filename: str, month: int = None, day: int = None, year: int = None) -> str:
         """ return dated filename"""
@@ -82,9 +494,58 @@ class FileHandler(ABC):
         day = str(day).rjust(2, '0')
         year = year if year is not None else today.year
         year = str(year)[-2:]
-        filename = f'{filename}_{year}_{month}_{day}'
+        filename = f'{filename}_{year}_{mont}_{day}'
         return self.check_filename(filename)
 
+    def load_file(self, filename: str, data_only: bool = True) -> list or dict:
+        """Load whatever the file holds, list or dict"""
+        raise NotImplementedError(f'{type(self).__name__} does not implement load_file')
+
+    def _iter_loaded(self, paths, workers: int, mode: str, data_only: bool, timeout: float, ordered: bool):
+        jobs = ((self, filename, data_only) for filename in paths)
+        for task in fan_out(_load_file, jobs, mode=mode, concurrency=workers, timeout=timeout,
+                            ordered=ordered, stream=True):
+            if task.ok:
+                yield task.result
+            else:
+                log.error('Unable to load %s: %r', task.item[1], task.error)
+                yield LoadedFile(task.item[1], error=task.error)
+
+    def load_many(self, paths, workers: int = None, mode: str = None, merge: bool = False,
+                  data_only: bool = True, timeout: float = None):
+        """
+        Load many files in parallel.
+        :param paths: iterable of filenames, the handler extension is added where missing
+        :param workers: pool size, default os.cpu_count()
+        :param mode: 'process' (parsing is CPU bound) or 'thread', default is the handler's parallel_mode
+        :param merge: return a MergedLoad, lists concatenated or dicts updated in path order
+        :param data_only: as in load_list_from_file, merge needs True
+        :param timeout: per file timeout in seconds
+        :return: generator of LoadedFile as files finish, or MergedLoad if merge
+        """
+        paths = [self.check_filename(filename) for filename in paths]
+        workers = workers if workers is not None else os.cpu_count() or 4
+        mode = mode if mode is not None else self.parallel_mode
+        if not merge:
+            return self._iter_loaded(paths, workers, mode, data_only, timeout, ordered=False)
+        files = list(self._iter_loaded(paths, workers, mode, data_only, timeout, ordered=True))
+        parts = [loaded.data for loaded in files if loaded.ok and loaded.data is not None]
+        if parts and all(isinstance(part, Mapping) for part in parts):
+            data = {}
+            for part in parts:
+                data.update(part)
+        else:
+            data = []
+            for part in parts:
+                if isinstance(part, Mapping):
+                    raise TypeError('load_many(merge=True) can not merge dict and list files')
+                data.extend(part)
+        return MergedLoad(data, files)
+
+    def load_glob(self, pattern: str, **kwargs):
+        """load_many for all files matching pattern ('**' recurses), in sorted order"""
+        return self.load_many(sorted(glob.glob(pattern, recursive=True)), **kwargs)
+
     @abstractmethod
     def save_data_to_file(self, data: list or dict, filename: str, comment: str = None) -> bool:
         """Save data list or dict to file"""
@@ -99,44 +560,59 @@ class FileHandler(ABC):
 
 
 class FileHandlerJSON(FileHandler):
-    """ File handling for .json type files"""
+    """
+    File handling for .json type files
+    backend: 'orjson', 'msgspec' or 'json', default is the fastest installed
+    compact: write without indentation, loading is the same either way
+    """
     extension = '.json'
+    parallel_mode = 'thread'    # orjson parses about as fast as a process pool can pickle the result back
+
+    def __init__(self, backend: str = None, compact: bool = False):
+        self.backend = get_json_backend(backend)
+        self.compact = compact
 
     def save_data_to_file(self, data: list or dict, filename: str, comment: str = None) -> bool:
         comment = RTB.xstr(comment, '')
-        filename = filename if filename.endswith(self.extension) else filename + self.extension
+        filename = self.check_filename(filename)
         data = {'fname': filename, 'comment': comment, 'date': str(datetime.datetime.today()), 'data': data}
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        with self.open_write(filename) as f:
+            f.write(self.backend.dumps(data, indent=not self.compact))
         return True
 
     @staticmethod
-    def _load_any_from_json_file(filename, data_only: bool = True) -> dict or list:
+    def _load_any_from_json_file(filename, data_only: bool = True,
+                                 backend: type[JSONBackend] = None) -> dict or list:
+        backend = backend if backend is not None else get_json_backend()
         try:
-            with open(filename, 'r') as file:
-                data = json.load(file)
+            with open_read(filename) as file:
+                data = backend.loads(file.read())
                 if data.get('data', None):
                     data['date'] = RTB.convert_str_to_datetime(data['date'])
-                log.debug(f'Loaded file{filename}, dated: {data.get("date", None)}')
+                log.debug('Loaded file%s, dated: %s', filename, data.get("date", None))
             if data_only:
                 return data.get('data', None)
             return data
         except FileNotFoundError as e:
-            log.error(f"File '{filename}' Not Found : {e}")
+            log.error("File '%s' Not Found : %s", filename, e)
             return None
 
+    def load_file(self, filename: str, data_only: bool = True) -> list or dict:
+        filename = self.check_filename(filename)
+        return self._load_any_from_json_file(filename=filename, data_only=data_only, backend=self.backend)
+
     def load_dict_from_file(self, filename: str = None, data_only: bool = True) -> dict:
         """load dict object from .json file"""
-        filename = filename if filename.endswith(self.extension) else filename + self.extension
-        data = self._load_any_from_json_file(filename=filename, data_only=data_only)
+        filename = self.check_filename(filename)
+        data = self._load_any_from_json_file(filename=filename, data_only=data_only, backend=self.backend)
         if type(data) is dict:
             return data
         return {}
 
     def load_list_from_file(self, filename: str = None, data_only: bool = True) -> list:
         """load list object from .json file"""
-        filename = filename if filename.endswith(self.extension) else filename + self.extension
-        data = self._load_any_from_json_file(filename=filename, data_only=data_only)
+        filename = self.check_filename(filename)
+        data = self._load_any_from_json_file(filename=filename, data_only=data_only, backend=self.backend)
         if type(data) is list:
             #Todo: check if data_only, may cause confusion, failure
             return data
@@ -144,30 +620,33 @@ class FileHandlerJSON(FileHandler):
 
 
 class FileHandlerYAML(FileHandler):
-    """File handling for .yml file type"""
+    """File handling for .yml file type, uses libyaml (CSafeLoader/CSafeDumper) when available"""
     extension = '.yml'
 
     def save_data_to_file(self, data: list or dict, filename: str, comment: str = None) -> bool:
         comment = RTB.xstr(comment, '')
         filename = self.check_filename(filename)
         data = {'fname': filename, 'comment': comment, 'date': str(datetime.datetime.today()), 'data': data}
-        with open(filename, 'w') as f:
-            yaml.safe_dump(data, f)
+        with self.open_write(filename, text=True) as f:
+            _yaml().dump(data, f, Dumper=YAMLDumper)
         return True
 
     @staticmethod
     def _load_any_from_yml_file(filename: str = None, data_only: bool = True) -> dict or list:
         try:
-            with open(filename, 'r') as f:
-                data = yaml.safe_load(f)
-                log.debug(f'Loaded file{filename}, dated: {data.get("date", None)}')
+            with open_read(filename, text=True) as f:
+                data = _yaml().load(f, Loader=YAMLLoader)
+                log.debug('Loaded file%s, dated: %s', filename, data.get("date", None))
             if data_only:
                 return data.get('data', None)
             return data
         except FileNotFoundError as e:
-            log.error(f"File '{filename}' Not Found : {e}")
+            log.error("File '%s' Not Found : %s", filename, e)
             return None
 
+    def load_file(self, filename: str, data_only: bool = True) -> list or dict:
+        return self._load_any_from_yml_file(filename=self.check_filename(filename), data_only=data_only)
+
     def load_dict_from_file(self, filename: str = None, data_only: bool = True) -> dict:
         filename = self.check_filename(filename)
         data = self._load_any_from_yml_file(filename=filename, data_only=data_only)
@@ -183,6 +662,674 @@ class FileHandlerYAML(FileHandler):
         return []
 
 
+class FileHandlerJSONL(FileHandler):
+    """
+    File handling for .jsonl (JSON lines) files, for datasets too large to hold in memory.
+    append_records() appends in place, it is not atomic like save_data_to_file().
+    Line 1 is the envelope without 'data': {'fname', 'comment', 'date', 'type'}, every following line is one record.
+    Lists are stored one item per line, dicts one [key, value] pair per line.
+    """
+    extension = '.jsonl'
+
+    def __init__(self, backend: str = None):
+        self.backend = get_json_backend(backend)
+
+    def _dumps(self, record) -> bytes:
+        return self.backend.dumps(record, indent=False) + b'\n'
+
+    def _header(self, filename: str, comment: str = None, data_type: str = 'list') -> dict:
+        return {'fname': filename, 'comment': RTB.xstr(comment, ''), 'date': str(datetime.datetime.today()),
+                'type': data_type}
+
+    def save_data_to_file(self, data, filename: str, comment: str = None) -> bool:
+        """Save list, dict or any iterable of records, iterables are written as they are consumed"""
+        filename = self.check_filename(filename)
+        data_type = 'dict' if isinstance(data, dict) else 'list'
+        records = data.items() if isinstance(data, dict) else data
+        with self.open_write(filename) as f:
+            f.write(self._dumps(self._header(filename, comment, data_type)))
+            for record in records:
+                f.write(self._dumps(list(record) if data_type == 'dict' else record))
+        return True
+
+    def append_records(self, records, filename: str, comment: str = None) -> int:
+        """Append records to file, creating it with a header if needed. Returns number of records written"""
+        filename = self.check_filename(filename)
+        count = 0
+        new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        with open_append(filename) as f:
+            if new_file:
+                f.write(self._dumps(self._header(filename, comment)))
+            for record in records:
+                f.write(self._dumps(record))
+                count += 1
+        return count
+
+    def load_header(self, filename: str) -> dict:
+        """Envelope of file without data, date converted to datetime. An empty file is an empty list"""
+        filename = self.check_filename(filename)
+        try:
+            with open_read(filename) as f:
+                line = f.readline()
+        except FileNotFoundError as e:
+            log.error("File '%s' Not Found : %s", filename, e)
+            return {}
+        if not line.strip():
+            return {'fname': filename, 'comment': '', 'date': None, 'type': 'list'}
+        header = self.backend.loads(line)
+        if header.get('date', None):
+            header['date'] = RTB.convert_str_to_datetime(header['date'])
+        return header
+
+    def iter_records(self, filename: str):
+        """Lazily yield records one at a time, memory use does not depend on file size"""
+        filename = self.check_filename(filename)
+        try:
+            with open_read(filename) as f:
+                f.readline()  # header
+                for line in f:
+                    if line.strip():
+                        yield self.backend.loads(line)
+        except FileNotFoundError as e:
+            log.error("File '%s' Not Found : %s", filename, e)
+
+    def _load_any_from_jsonl_file(self, filename: str, data_only: bool = True) -> dict or list:
+        header = self.load_header(filename)
+        if not header:
+            return None
+        if header.get('type', 'list') == 'dict':
+            data = {key: value for key, value in self.iter_records(filename)}
+        else:
+            data = list(self.iter_records(filename))
+        log.debug('Loaded file%s, dated: %s', filename, header.get("date", None))
+        if data_only:
+            return data
+        header['data'] = data
+        return header
+
+    def load_file(self, filename: str, data_only: bool = True) -> list or dict:
+        return self._load_any_from_jsonl_file(filename=filename, data_only=data_only)
+
+    def load_dict_from_file(self, filename: str = None, data_only: bool = True) -> dict:
+        data = self._load_any_from_jsonl_file(filename=filename, data_only=data_only)
+        if type(data) is dict:
+            return data
+        return {}
+
+    def load_list_from_file(self, filename: str = None, data_only: bool = True) -> list:
+        data = self._load_any_from_jsonl_file(filename=filename, data_only=data_only)
+        if type(data) is list:
+            return data
+        return []
+
+
+# Binary columnar format, see FileHandlerColumnar
+COLUMNAR_MAGIC = b'RTBC'
+COLUMNAR_VERSION = 1
+_TRAILER = struct.Struct('<QI4s')   # footer offset, version, magic
+_KEY_COLUMN = '__key__'
+_VALUE_COLUMN = '__value__'
+_ARRAY_TYPES = {'int': 'q', 'float': 'd'}
+
+
+def _column_type(values: list) -> str:
+    """Smallest column type holding every non None value, 'json' for anything mixed or nested"""
+    types = {type(value) for value in values if value is not None and value is not _MISSING}
+    if not types:
+        return 'str'
+    if len(types) > 1:
+        return 'json'
+    value_type = types.pop()
+    return {int: 'int', float: 'float', bool: 'bool', str: 'str'}.get(value_type, 'json')
+
+
+class _Missing:
+    __slots__ = ()
+
+
+_MISSING = _Missing()
+
+
+class ColumnarRecord(Mapping):
+    """Read only dict-like view of one row, fields are read from the mapped file on access"""
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'ColumnarTable', row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        table = self._table
+        column = table.index.get(key)
+        if column is None or table.is_missing(column, self._row):
+            raise KeyError(key)
+        return table.getter(column)(self._row)
+
+    def __iter__(self):
+        table = self._table
+        return (name for name in table.fields if not table.is_missing(table.index[name], self._row))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self}
+
+    def __repr__(self):
+        return f'ColumnarRecord({self.to_dict()!r})'
+
+
+class ColumnarTable(Sequence):
+    """
+    Rows of a FileHandlerColumnar file, read through mmap. Opening only parses the footer, rows are
+    ColumnarRecord views and column() reads a single column without touching the others.
+    Close it (or use it as a context manager) to release the file before replacing it.
+    """
+
+    def __init__(self, filename: str, backend: type[JSONBackend] = None):
+        self.filename = filename
+        self.backend = backend if backend is not None else get_json_backend()
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._views = []
+        self._getters = []
+        self._missing = []
+        try:
+            footer_offset, version, magic = _TRAILER.unpack(self._buffer[-_TRAILER.size:])
+            if magic != COLUMNAR_MAGIC or self._buffer[:4] != COLUMNAR_MAGIC:
+                raise ValueError(f"'{filename}' is not a columnar file")
+            if version > COLUMNAR_VERSION:
+                raise ValueError(f"'{filename}' has unsupported version {version}")
+            self.header = json.loads(bytes(self._buffer[footer_offset:-_TRAILER.size]))
+        except Exception:
+            self.close()
+            raise
+        self.columns = self.header['columns']
+        self.index = {column['name']: enum for enum, column in enumerate(self.columns)}
+        hidden = (_KEY_COLUMN, _VALUE_COLUMN)
+        self.fields = [column['name'] for column in self.columns if column['name'] not in hidden]
+        self._rows = self.header['rows']
+        self._getters = [None] * len(self.columns)
+        self._missing = [self._section(column, 'missing') for column in self.columns]
+        self._scalar = self.header.get('scalar', False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._getters = [None] * len(self._getters)
+        self._missing = [None] * len(self._missing)
+        self._buffer.release()
+        self._mmap.close()
+
+    def _view(self, offset: int, length: int, fmt: str = 'B') -> memoryview:
+        view = self._buffer[offset:offset + length]
+        self._views.append(view)
+        if fmt != 'B':
+            view = view.cast(fmt)
+            self._views.append(view)
+        return view
+
+    def _section(self, column: dict, name: str, fmt: str = 'B'):
+        section = column['sections'].get(name)
+        if section is None:
+            return None
+        view = self._view(*section, fmt=fmt)
+        if fmt != 'B' and sys.byteorder == 'big':    # stored little endian, copy and swap
+            view = array.array(fmt, view)
+            view.byteswap()
+        return view
+
+    def is_missing(self, column: int, row: int) -> bool:
+        missing = self._missing[column]
+        return missing is not None and missing[row] == 1
+
+    def getter(self, column: int):
+        """Function row -> value for one column, built on first use"""
+        get = self._getters[column]
+        if get is None:
+            get = self._getters[column] = self._build_getter(self.columns[column])
+        return get
+
+    def _build_getter(self, column: dict):
+        kind = column['type']
+        if kind in _ARRAY_TYPES:
+            get = self._section(column, 'values', _ARRAY_TYPES[kind]).__getitem__
+        elif kind == 'bool':
+            values = self._section(column, 'values')
+
+            def get(row):
+                return values[row] == 1
+        elif kind == 'str':
+            get = self._string_getter(column)
+        else:
+            offsets = self._section(column, 'offsets', 'Q')
+            blob = self._section(column, 'data')
+            loads = self.backend.loads
+
+            def get(row):
+                return loads(bytes(blob[offsets[row]:offsets[row + 1]]))
+        nulls = self._section(column, 'nulls')
+        if nulls is None:
+            return get
+        value = get
+
+        def get(row):
+            return None if nulls[row] else value(row)
+        return get
+
+    def _string_getter(self, column: dict):
+        """Dictionary encoded strings, each distinct string is decoded once"""
+        codes = self._section(column, 'codes', 'I')
+        offsets = self._section(column, 'offsets', 'Q')
+        blob = self._section(column, 'data')
+        strings = [None] * (len(offsets) - 1)
+
+        def get(row):
+            code = codes[row]
+            text = strings[code]
+            if text is None:
+                text = strings[code] = str(blob[offsets[code]:offsets[code + 1]], 'utf-8')
+            return text
+        return get
+
+    def __repr__(self):
+        return f"ColumnarTable('{self.filename}', rows={self._rows}, fields={self.fields})"
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[row] for row in range(*item.indices(self._rows))]
+        row = item + self._rows if item < 0 else item
+        if not 0 <= row < self._rows:
+            raise IndexError('row index out of range')
+        if self._scalar:
+            return self.getter(self.index[_VALUE_COLUMN])(row)
+        return ColumnarRecord(self, row)
+
+    def __iter__(self):
+        if self._scalar:
+            get = self.getter(self.index[_VALUE_COLUMN])
+            return (get(row) for row in range(self._rows))
+        return (ColumnarRecord(self, row) for row in range(self._rows))
+
+    def column(self, name: str) -> list:
+        """All values of one field, None where a record has no such field"""
+        column = self.index[name]
+        get = self.getter(column)
+        if self._missing[column] is None:
+            return [get(row) for row in range(self._rows)]
+        return [None if self.is_missing(column, row) else get(row) for row in range(self._rows)]
+
+    def select(self, *fields: str):
+        """Yield dicts holding only the given fields, only those columns are read"""
+        columns = [(name, self.index[name]) for name in fields]
+        getters = [(name, column, self.getter(column)) for name, column in columns]
+        for row in range(self._rows):
+            yield {name: get(row) for name, column, get in getters if not self.is_missing(column, row)}
+
+    def keys(self) -> list:
+        """Keys of a saved dict, in saved order"""
+        return self.column(_KEY_COLUMN) if _KEY_COLUMN in self.index else []
+
+    def to_list(self) -> list:
+        return [row.to_dict() if isinstance(row, ColumnarRecord) else row for row in self]
+
+
+class FileHandlerColumnar(FileHandler):
+    """
+    File handling for .rtbc, a binary column oriented format for large lists of dicts.
+    Loading maps the file instead of parsing it: load_list_from_file returns a ColumnarTable of lazy
+    ColumnarRecord views (a Sequence, not a list), so opening is independent of file size and only the
+    fields that are read get decoded.
+    Layout: 'RTBC', column sections (8 byte aligned), JSON footer with the schema and section offsets,
+    trailer (footer offset, version, 'RTBC'). Column types:
+        int / float: little endian int64 / float64
+        bool: one byte per row
+        str: dictionary encoded, uint32 code per row plus the distinct strings
+        json: anything else (lists, dicts, mixed types), uint64 offsets plus JSON per row
+    Each column may add a null byte map and a missing byte map for records without the field.
+    Dicts are stored with their keys in a '__key__' column, lists of non dicts in a '__value__' column.
+    Compression extensions are not supported, the file has to be mapped.
+    """
+    extension = '.rtbc'
+    parallel_mode = 'thread'    # opening is cheap and mapped tables can't be pickled
+
+    def __init__(self, backend: str = None):
+        self.backend = get_json_backend(backend)
+
+    def check_filename(self, filename):
+        filename = super().check_filename(filename)
+        if split_compression(filename)[1]:
+            raise ValueError(f"'{filename}': {self.extension} files can't be compressed, they are memory mapped")
+        return filename
+
+    def _encode_column(self, values: list) -> tuple[str, dict]:
+        """Column type and its sections as bytes"""
+        kind = _column_type(values)
+        sections = {}
+        present = [value if value is not _MISSING else None for value in values]
+        if kind == 'int':
+            try:
+                sections['values'] = array.array('q', (0 if value is None else value for value in present))
+            except OverflowError:
+                kind = 'json'
+        if kind == 'float':
+            sections['values'] = array.array('d', (0.0 if value is None else value for value in present))
+        elif kind == 'bool':
+            sections['values'] = bytes(1 if value else 0 for value in present)
+        elif kind == 'str':
+            distinct = {}
+            codes = array.array('I', (distinct.setdefault(value, len(distinct)) if value is not None else 0
+                                      for value in present))
+            encoded = [text.encode('utf-8') for text in distinct]
+            sections['codes'] = codes
+            sections['offsets'] = array.array('Q', itertools.accumulate((len(raw) for raw in encoded), initial=0))
+            sections['data'] = b''.join(encoded)
+        elif kind == 'json':
+            dumps = self.backend.dumps
+            encoded = [dumps(value, indent=False) for value in present]
+            sections['offsets'] = array.array('Q', itertools.accumulate((len(raw) for raw in encoded), initial=0))
+            sections['data'] = b''.join(encoded)
+        if any(value is None for value in values):
+            sections['nulls'] = bytes(1 if value is None else 0 for value in values)
+        if any(value is _MISSING for value in values):
+            sections['missing'] = bytes(1 if value is _MISSING else 0 for value in values)
+        if sys.byteorder == 'big':
+            for section in sections.values():
+                if isinstance(section, array.array):
+                    section.byteswap()
+        return kind, sections
+
+    def save_data_to_file(self, data: list or dict, filename: str, comment: str = None) -> bool:
+        """Save a list of dicts (or dict of dicts), other items are stored whole as JSON values"""
+        filename = self.check_filename(filename)
+        data_type = 'dict' if isinstance(data, dict) else 'list'
+        rows = list(data.values()) if data_type == 'dict' else list(data)
+        scalar = not all(isinstance(row, Mapping) for row in rows)
+        columns = {}
+        if data_type == 'dict':
+            columns[_KEY_COLUMN] = list(data.keys())
+        if scalar:
+            columns[_VALUE_COLUMN] = rows
+        else:
+            fields = {}
+            for row in rows:
+                for key in row:
+                    if key not in fields:
+                        if not isinstance(key, str):
+                            raise TypeError(f'{self.extension} field names must be str, got {key!r}')
+                        fields[key] = None
+            for name in fields:
+                columns[name] = [row.get(name, _MISSING) for row in rows]
+
+        header = {'fname': filename, 'comment': RTB.xstr(comment, ''), 'date': str(datetime.datetime.today()),
+                  'type': data_type, 'rows': len(rows), 'scalar': scalar, 'columns': []}
+        with self.open_write(filename) as f:
+            f.write(COLUMNAR_MAGIC + b'\0' * 4)
+            offset = 8
+            for name, values in columns.items():
+                kind, sections = self._encode_column(values)
+                located = {}
+                for section_name, section in sections.items():
+                    raw = section.tobytes() if isinstance(section, array.array) else section
+                    f.write(raw)
+                    located[section_name] = [offset, len(raw)]
+                    padding = -len(raw) % 8
+                    f.write(b'\0' * padding)
+                    offset += len(raw) + padding
+                header['columns'].append({'name': name, 'type': kind, 'sections': located})
+                columns[name] = None    # release the column while the next one is built
+            f.write(json.dumps(header, separators=(',', ':')).encode('utf-8'))
+            f.write(_TRAILER.pack(offset, COLUMNAR_VERSION, COLUMNAR_MAGIC))
+        return True
+
+    def open_table(self, filename: str) -> ColumnarTable or None:
+        filename = self.check_filename(filename)
+        try:
+            return ColumnarTable(filename, backend=self.backend)
+        except FileNotFoundError as e:
+            log.error("File '%s' Not Found : %s", filename, e)
+            return None
+
+    def _load_any_from_columnar_file(self, filename: str, data_only: bool, data_type: str = None):
+        table = self.open_table(filename)
+        if table is None:
+            return None
+        data_type = data_type if data_type is not None else table.header['type']
+        if table.header['type'] != data_type:
+            table.close()   # nothing returned holds on to it
+            return None
+        if data_type == 'dict':
+            data = dict(zip(table.keys(), table))
+        else:
+            data = table
+        header = {key: table.header[key] for key in ('fname', 'comment', 'date')}
+        header['date'] = RTB.convert_str_to_datetime(header['date'])
+        log.debug('Loaded file%s, dated: %s', filename, header['date'])
+        if data_only:
+            return data
+        header['data'] = data
+        return header
+
+    def load_file(self, filename: str, data_only: bool = True) -> ColumnarTable or dict:
+        return self._load_any_from_columnar_file(filename, data_only)
+
+    def load_dict_from_file(self, filename: str = None, data_only: bool = True) -> dict:
+        """Dict of ColumnarRecord views, the keys are read up front"""
+        data = self._load_any_from_columnar_file(filename, data_only, 'dict')
+        return data if data is not None else {}
+
+    def load_list_from_file(self, filename: str = None, data_only: bool = True) -> ColumnarTable or list:
+        """ColumnarTable of ColumnarRecord views"""
+        data = self._load_any_from_columnar_file(filename, data_only, 'list')
+        return data if data is not None else []
+
+
+@dataclass
+class SnapshotDiff:
+    """Changes between two snapshot dates, records keyed by record id"""
+    added: dict = field(default_factory=dict)
+    changed: dict = field(default_factory=dict)
+    removed: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class SnapshotStore:
+    """
+    Dated snapshots of a list (or dict) of records, stored as deltas keyed by record id.
+    Every save writes only the records whose content hash changed since the previous snapshot, unchanged
+    snapshots write nothing but the index. A full base snapshot is written when the changes since the
+    last base add up to keyframe_ratio of the records, which bounds the replay needed to rebuild a date.
+    Files in directory, named with FileHandler.date_filename:
+        <name>_index.json               snapshot dates, file names and the content hash of every current record
+        <name>_base_YY_MM_DD.<ext>      full snapshot {id: record}
+        <name>_delta_YY_MM_DD.<ext>     {'upsert': {id: record}, 'added': [ids], 'delete': [ids]}
+    key: field name, tuple of field names (composite id) or function record -> id. Ids are stored as str,
+    composite ids joined with '|'.
+    compression: optional '.gz', '.zst' or '.lz4' for base and delta files.
+    """
+
+    def __init__(self, name: str, directory: str = '.', key='serial', filehandler: FileHandler = None,
+                 keyframe_ratio: float = 0.5, compression: str = ''):
+        self.name = name
+        self.directory = directory
+        self.key = key
+        self.filehandler = filehandler if filehandler is not None else FileHandlerJSON(compact=True)
+        self.keyframe_ratio = keyframe_ratio
+        self.compression = compression
+        self._index_handler = FileHandlerJSON(compact=True)
+        self._index_file = os.path.join(directory, f'{name}_index.json')
+        self._cache = None  # (snapshot position, {id: record}) of the last rebuilt snapshot
+        self.index = self._index_handler.load_dict_from_file(self._index_file) \
+            if os.path.exists(self._index_file) else {}
+        self.index.setdefault('snapshots', [])
+        self.index.setdefault('head', {})
+
+    @property
+    def dates(self) -> list[datetime.date]:
+        return [datetime.date.fromisoformat(snapshot['date']) for snapshot in self.index['snapshots']]
+
+    def record_id(self, record) -> str:
+        if callable(self.key):
+            record_id = self.key(record)
+        elif isinstance(self.key, (tuple, list)):
+            record_id = tuple(record.get(part, None) for part in self.key)
+        else:
+            record_id = record.get(self.key, None)
+        if isinstance(record_id, tuple):
+            return '|'.join(str(part) for part in record_id)
+        return str(record_id)
+
+    @staticmethod
+    def content_hash(record) -> str:
+        """Always the stdlib json canonical form, backends differ in bytes and the hash must not"""
+        raw = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _to_date(date) -> datetime.date:
+        if date is None:
+            return datetime.date.today()
+        if isinstance(date, datetime.datetime):
+            return date.date()
+        if isinstance(date, str):
+            return datetime.date.fromisoformat(date)
+        return date
+
+    def _filename(self, kind: str, date: datetime.date) -> str:
+        filename = self.filehandler.date_filename(os.path.join(self.directory, f'{self.name}_{kind}'),
+                                                  month=date.month, day=date.day, year=date.year)
+        return filename + self.compression
+
+    def _position(self, date) -> int:
+        """Position of the last snapshot on or before date, -1 if there is none"""
+        return bisect.bisect_right([snapshot['date'] for snapshot in self.index['snapshots']],
+                                   self._to_date(date).isoformat()) - 1
+
+    def save(self, data: list or dict, date=None, comment: str = None) -> dict:
+        """
+        Store data as the snapshot of date (default today). Dates must be added in order.
+        Returns the index entry: date, base/delta file names and added/changed/removed counts.
+        """
+        date = self._to_date(date)
+        snapshots = self.index['snapshots']
+        if snapshots and snapshots[-1]['date'] >= date.isoformat():
+            raise ValueError(f"Snapshot {date} is not after the last snapshot {snapshots[-1]['date']}")
+        records = data if isinstance(data, dict) else {self.record_id(record): record for record in data}
+        if not isinstance(data, dict) and len(records) != len(data):
+            log.warning('%s: %d records share an id, the last one is kept', self.name, len(data) - len(records))
+        hashes = {str(record_id): self.content_hash(record) for record_id, record in records.items()}
+        records = {str(record_id): record for record_id, record in records.items()}
+
+        head = self.index['head']
+        upsert = {record_id: records[record_id] for record_id, digest in hashes.items()
+                  if head.get(record_id) != digest}
+        added = [record_id for record_id in upsert if record_id not in head]
+        delete = [record_id for record_id in head if record_id not in hashes]
+        entry = {'date': date.isoformat(), 'type': 'dict' if isinstance(data, dict) else 'list',
+                 'base': None, 'delta': None, 'records': len(records),
+                 'added': len(added), 'changed': len(upsert) - len(added), 'removed': len(delete)}
+
+        if snapshots and (upsert or delete):
+            entry['delta'] = self._filename('delta', date)
+            self.filehandler.save_data_to_file({'upsert': upsert, 'added': added, 'delete': delete},
+                                               entry['delta'], comment=comment)
+        since_base = sum(snapshot['added'] + snapshot['changed'] + snapshot['removed']
+                         for snapshot in snapshots[self._base_position(len(snapshots) - 1) + 1:])
+        since_base += len(upsert) + len(delete)
+        if not snapshots or since_base >= self.keyframe_ratio * max(len(records), 1):
+            entry['base'] = self._filename('base', date)
+            self.filehandler.save_data_to_file(records, entry['base'], comment=comment)
+        snapshots.append(entry)
+        self.index['head'] = hashes
+        self._index_handler.save_data_to_file(self.index, self._index_file, comment=self.name)
+        self._cache = (len(snapshots) - 1, records)
+        return entry
+
+    def _base_position(self, position: int) -> int:
+        """Position of the last base snapshot at or before position"""
+        snapshots = self.index['snapshots']
+        while position >= 0 and snapshots[position]['base'] is None:
+            position -= 1
+        return position
+
+    def _load_delta(self, position: int) -> dict:
+        filename = self.index['snapshots'][position]['delta']
+        if filename is None:
+            return {'upsert': {}, 'added': [], 'delete': []}
+        return self.filehandler.load_dict_from_file(filename)
+
+    def _state(self, position: int) -> dict:
+        """{id: record} of the snapshot at position, replayed from the nearest base or the cached snapshot"""
+        start = self._base_position(position)
+        if self._cache is not None and start <= self._cache[0] <= position:
+            start, state = self._cache[0], dict(self._cache[1])
+        else:
+            state = dict(self.filehandler.load_dict_from_file(self.index['snapshots'][start]['base']))
+        for step in range(start + 1, position + 1):
+            delta = self._load_delta(step)
+            for record_id in delta['delete']:
+                state.pop(record_id, None)
+            state.update(delta['upsert'])
+        self._cache = (position, state)
+        return state
+
+    def load(self, date=None) -> list or dict:
+        """Snapshot as of date (default latest): a list of records, or a dict if a dict was saved"""
+        position = self._position(date) if date is not None else len(self.index['snapshots']) - 1
+        if position < 0:
+            return []
+        state = self._state(position)
+        if self.index['snapshots'][position]['type'] == 'dict':
+            return dict(state)
+        return list(state.values())
+
+    def diff(self, date_a, date_b) -> SnapshotDiff:
+        """
+        Changes from the snapshot as of date_a to the one as of date_b, read from the deltas in between only.
+        changed holds the records as of date_b.
+        """
+        start, end = self._position(date_a), self._position(date_b)
+        if start > end:
+            raise ValueError(f'{date_a} is after {date_b}')
+        existed = {}    # id -> existed as of date_a, set when the id is first touched
+        final = {}      # id -> record as of date_b, None if deleted
+        for position in range(start + 1, end + 1):
+            if position == 0:
+                base = self.filehandler.load_dict_from_file(self.index['snapshots'][0]['base'])
+                delta = {'upsert': base, 'added': list(base), 'delete': []}
+            else:
+                delta = self._load_delta(position)
+            added = set(delta['added'])
+            for record_id in delta['delete']:
+                existed.setdefault(record_id, True)
+                final[record_id] = None
+            for record_id, record in delta['upsert'].items():
+                existed.setdefault(record_id, record_id not in added)
+                final[record_id] = record
+        result = SnapshotDiff()
+        for record_id, record in final.items():
+            if existed[record_id] and record is None:
+                result.removed.append(record_id)
+            elif existed[record_id]:
+                result.changed[record_id] = record
+            elif record is not None:
+                result.added[record_id] = record
+        return result
+
+
 class Tester:
 
     def __init__(self, fh: FileHandler = None, filename: str = 'test123'):
@@ -259,7 +1406,7 @@ class Tester:
 
 
 def testing():
-    tests = [FileHandlerJSON, FileHandlerYAML]
+    tests = [FileHandlerJSON, FileHandlerYAML, FileHandlerJSONL, FileHandlerColumnar]
     for test in tests:
         print('######################')
         print(test.__name__)
@@ -0,0 +1,168 @@
+import atexit
+import datetime
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+from Robs_Toolbox2.toolbox import log
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands the record over untouched, message formatting happens on the writer thread.
+    Arguments are formatted when written, so don't mutate objects passed as log arguments afterwards.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a 'rate' fraction (0-1) of records at or below 'level', higher levels always pass"""
+
+    def __init__(self, rate: float = 0.1, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most 'burst' records per call site and message template every 'interval' seconds.
+    The next record that passes notes how many were dropped.
+    At most 'max_keys' windows are kept, f-string messages make a key per distinct message: once full,
+    expired windows are dropped, then the oldest ones.
+    """
+
+    def __init__(self, interval: float = 10.0, burst: int = 5, max_keys: int = 1000):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self._windows: dict = {}    # (pathname, lineno, msg) -> [window_start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """Called with the lock held and the table full"""
+        for key in [key for key, window in self._windows.items() if now - window[0] >= self.interval]:
+            del self._windows[key]
+        excess = len(self._windows) - self.max_keys * 3 // 4
+        if excess > 0:
+            for key in list(itertools.islice(self._windows, excess)):
+                del self._windows[key]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.pathname, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                if window is None and len(self._windows) >= self.max_keys:
+                    self._prune(now)
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': datetime.datetime.fromtimestamp(record.created).isoformat(),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'module': record.module,
+                 'function': record.funcName,
+                 'line': record.lineno,
+                 'thread': record.threadName,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listeners: dict = {}   # logger name -> (QueueListener, QueueHandler, original handlers, logger)
+
+
+def _disable_all() -> None:
+    """atexit: drain every queue, the writer threads are daemons and would die with records still queued"""
+    for entry in list(_listeners.values()):
+        disable_queue_logging(entry[3])
+
+
+atexit.register(_disable_all)
+
+
+def enable_queue_logging(logger: logging.Logger = log, defer_format: bool = True, sample_rate: float = None,
+                         sample_level: int = logging.DEBUG, rate_limit: tuple[float, int] = None,
+                         maxsize: int = 0) -> logging.handlers.QueueListener:
+    """
+    Move the logger's handlers behind a queue, written by a background thread.
+    Callers only pay for the level check and an enqueue. Queued records are written out at interpreter exit.
+    :param logger: logger to convert, default is the shared toolbox log
+    :param defer_format: format messages on the writer thread instead of the caller
+    :param sample_rate: keep only this fraction of records at or below sample_level
+    :param sample_level: highest level that gets sampled
+    :param rate_limit: (interval seconds, burst) per call site, see RateLimitFilter
+    :param maxsize: queue size, 0 is unbounded
+    :return: the running QueueListener
+    """
+    if logger.name in _listeners:
+        return _listeners[logger.name][0]
+    handlers = list(logger.handlers)
+    log_queue = queue.Queue(maxsize=maxsize)
+    handler = DeferredQueueHandler(log_queue) if defer_format else logging.handlers.QueueHandler(log_queue)
+    if sample_rate is not None:
+        handler.addFilter(SamplingFilter(rate=sample_rate, level=sample_level))
+    if rate_limit is not None:
+        handler.addFilter(RateLimitFilter(*rate_limit))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for original in handlers:
+        logger.removeHandler(original)
+    logger.addHandler(handler)
+    listener.start()
+    _listeners[logger.name] = (listener, handler, handlers, logger)
+    return listener
+
+
+def disable_queue_logging(logger: logging.Logger = log) -> None:
+    """Flush the queue, stop the writer thread and put the original handlers back"""
+    entry = _listeners.pop(logger.name, None)
+    if entry is None:
+        return
+    listener, handler, handlers, _ = entry
+    listener.stop()
+    logger.removeHandler(handler)
+    for original in handlers:
+        logger.addHandler(original)
+
+
+def add_json_sink(filename: str, logger: logging.Logger = log, level: int = logging.DEBUG) -> logging.Handler:
+    """Write records as JSON lines to filename. With queue logging on, the sink is written by the writer thread"""
+    handler = logging.FileHandler(filename, encoding='utf-8')
+    handler.setLevel(level)
+    handler.setFormatter(JSONLinesFormatter())
+    entry = _listeners.get(logger.name)
+    if entry is None:
+        logger.addHandler(handler)
+    else:
+        listener = entry[0]
+        listener.handlers = listener.handlers + (handler,)
+        entry[2].append(handler)
+    return handler
@@ -0,0 +1,172 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds: 1us to ~1000s, sqrt(2) apart
+BUCKETS = tuple(1e-6 * 2 ** (i / 2) for i in range(61))
+
+_span_stack = contextvars.ContextVar('rtb_span_stack', default=())
+
+
+class TimingStats:
+    """Call count, total/min/max and a fixed bucket histogram for one timed name"""
+    __slots__ = ('name', 'count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Approximate percentile (0-100), upper bound of the bucket holding it"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank and hits:
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'total': self.total, 'mean': self.mean,
+                'min': self.min if self.count else 0.0, 'max': self.max,
+                'p50': self.percentile(50), 'p95': self.percentile(95), 'p99': self.percentile(99)}
+
+
+class Profiler:
+    """
+    Registry of timings, fed by my_time/my_async_time and span().
+    When disabled, timed calls go straight to the wrapped function and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stats: dict[str, TimingStats] = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = TimingStats(name)
+            stats.add(seconds)
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """
+        Time a block. Nested spans are recorded as 'outer/inner'.
+            with profiler.span('load'):
+                ...
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = _span_stack.get() + (name,)
+        token = _span_stack.set(stack)
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record('/'.join(stack), time.perf_counter() - tic)
+            _span_stack.reset(token)
+
+    def timed(self, func=None, name: str = None):
+        """Decorator recording every call of func (sync or async), usable as @timed or @timed(name='x')"""
+        if func is None:
+            return functools.partial(self.timed, name=name)
+        name = name if name is not None else func.__qualname__
+        profiler = self
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not profiler.enabled:
+                    return await func(*args, **kwargs)
+                tic = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    profiler.record(name, time.perf_counter() - tic)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            tic = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter() - tic)
+        return wrapper
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self.stats.items())}
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, metric: str = 'rtb_function_seconds') -> str:
+        """Prometheus text exposition format, one histogram series per timed name"""
+        lines = [f'# HELP {metric} Runtime of timed toolbox functions and spans.',
+                 f'# TYPE {metric} histogram']
+        with self._lock:
+            items = sorted(self.stats.items())
+            for name, stats in items:
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for upper, hits in zip(BUCKETS, stats.buckets):
+                    cumulative += hits
+                    lines.append(f'{metric}_bucket{{function="{label}",le="{upper:.6g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{function="{label}",le="+Inf"}} {stats.count}')
+                lines.append(f'{metric}_sum{{function="{label}"}} {stats.total:.9f}')
+                lines.append(f'{metric}_count{{function="{label}"}} {stats.count}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self) -> str:
+        """Table of timings, slowest total first"""
+        lines = [f"{'name':<40}{'calls':>8}{'total s':>12}{'mean s':>12}{'p50 s':>12}{'p95 s':>12}{'p99 s':>12}"]
+        for name, stats in sorted(self.snapshot().items(), key=lambda item: -item[1]['total']):
+            lines.append(f"{name:<40}{stats['count']:>8}{stats['total']:>12.4f}{stats['mean']:>12.6f}"
+                         f"{stats['p50']:>12.6f}{stats['p95']:>12.6f}{stats['p99']:>12.6f}")
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+span = profiler.span
+timed = profiler.timed
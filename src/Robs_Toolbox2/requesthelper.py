@@ -1,5 +1,24 @@
-from toolbox import log, pp
+import asyncio
+import base64
+import fnmatch
+import functools
+import gzip
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+from Robs_Toolbox2.toolbox import fan_out, log, pp
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from json import dumps
 
@@ -11,6 +30,412 @@ def silence_request_warnings() -> None:
     requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 
+class TokenBucket:
+    """
+    Thread safe token bucket. 'rate' tokens per second up to 'capacity', rate=None never throttles.
+    reserve() takes a token and returns the seconds the caller must wait before using it.
+    """
+
+    def __init__(self, rate: float = None, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else (rate or 1)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.rate is None:
+                return wait
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for 'seconds', used when the server says to back off"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+
+
+class RequestScheduler:
+    """
+    Per host token bucket budgets plus retry policy shared by RequestHelper and AsyncRequestHelper.
+        - 429: wait for Retry-After (or backoff when missing), the whole host is paused meanwhile
+        - 5xx: jittered exponential backoff
+    5xx responses, and 429 without Retry-After, are only retried for idempotent methods (IDEMPOTENT_METHODS),
+    a POST/PATCH may have been applied before the error so resending could apply it twice.
+    stats counts requests, queued (had to wait for a token), retried, throttled (429) and failed (gave up).
+    """
+
+    def __init__(self, rate: float = None, burst: float = None, host_rates: dict = None, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 60.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.buckets: dict[str, TokenBucket] = {}
+        self.stats = {'requests': 0, 'queued': 0, 'retried': 0, 'throttled': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        for host, rate in (host_rates or {}).items():
+            self.set_host_rate(host, rate)
+
+    def set_host_rate(self, host: str, rate: float = None, burst: float = None) -> None:
+        with self._lock:
+            self.buckets[host] = TokenBucket(rate, burst)
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def reserve(self, host: str) -> float:
+        """Take a token for host, return seconds to wait before sending"""
+        self._count('requests')
+        delay = self.bucket(host).reserve()
+        if delay > 0:
+            self._count('queued')
+        return delay
+
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def parse_retry_after(value: str) -> float or None:
+        """Retry-After is either delay seconds or an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def retry_delay(self, host: str, response: requests.Response, attempt: int, retry: bool = True) \
+            -> float or None:
+        """
+        Seconds to wait before retrying response, or None if it should be returned as is.
+        retry=False (non-idempotent request) only retries a 429 carrying Retry-After, the server did not
+        process that request
+        """
+        status = response.status_code
+        if status != 429 and status < 500:
+            return None
+        if status == 429:
+            self._count('throttled')
+        retry_after = self.parse_retry_after(response.headers.get('Retry-After')) if status == 429 else None
+        if not retry and retry_after is None:
+            return None
+        if attempt >= self.max_retries:
+            self._count('failed')
+            return None
+        if status == 429:
+            delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+            self.bucket(host).pause(delay)
+        else:
+            delay = self.backoff_delay(attempt)
+        self._count('retried')
+        return delay
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes = field(repr=False)
+    stored: float
+    ttl: float
+    key: str = None     # ResponseCache.key, url plus encoded query
+    vary: dict = None   # {request header: value} for the response's Vary headers
+
+    def __post_init__(self):
+        self.headers = CaseInsensitiveDict(self.headers)
+        if self.key is None:
+            self.key = self.url
+        if self.vary is None:
+            self.vary = {}
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.stored < self.ttl
+
+    @property
+    def etag(self) -> str or None:
+        return self.headers.get('ETag', None)
+
+    @property
+    def last_modified(self) -> str or None:
+        return self.headers.get('Last-Modified', None)
+
+    def matches(self, headers) -> bool:
+        """True if the request headers agree with the ones the response varies on"""
+        headers = CaseInsensitiveDict(headers or {})
+        return all(headers.get(name, None) == value for name, value in self.vary.items())
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = self.url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'status_code': self.status_code, 'headers': dict(self.headers),
+                'content': base64.b64encode(self.content).decode('ascii'), 'stored': self.stored, 'ttl': self.ttl,
+                'key': self.key, 'vary': self.vary}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CacheEntry':
+        data = dict(data)
+        data['content'] = base64.b64decode(data['content'])
+        return cls(**data)
+
+
+class ResponseCache:
+    """
+    GET response cache for RequestHelper.
+    Memory tier is an LRU of 'max_entries', the optional disk tier writes each entry through FileHandlerJSON
+    into 'directory'. TTLs are per endpoint: 'ttls' maps fnmatch patterns on the url path to seconds, first match
+    wins, otherwise 'default_ttl'. Stale entries with an ETag/Last-Modified are revalidated with a conditional GET,
+    a 304 refreshes the entry without downloading the body again.
+    Entries are keyed on the url with its encoded query and a hash of the credential headers (key()), so one
+    credential never gets responses fetched with another. A response with Vary is only reused for requests
+    sending the same values of those headers. Requests with options outside CACHEABLE_OPTIONS bypass the cache.
+    """
+    # request options that don't change the response
+    CACHEABLE_OPTIONS = frozenset({'headers', 'params', 'timeout', 'verify', 'proxies', 'allow_redirects'})
+    # header names containing one of these carry credentials and are part of the key, e.g. Authorization,
+    # X-Cisco-Meraki-API-Key, X-Auth-Token, Cookie
+    CREDENTIAL_HEADERS = ('auth', 'api-key', 'apikey', 'token', 'cookie', 'secret')
+
+    def __init__(self, max_entries: int = 256, directory: str = None, default_ttl: float = 300,
+                 ttls: dict = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.ttls = ttls if ttls is not None else {}
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._filehandler = None
+        if directory is not None:     # filehandler (and yaml) only loaded for the disk tier
+            from Robs_Toolbox2.filehandler import FileHandlerJSON, check_required_directory
+            self._filehandler = FileHandlerJSON()
+            check_required_directory(outfolder=directory, create_folder=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ttl_for(self, url: str) -> float:
+        path = urlparse(url).path
+        for pattern, ttl in self.ttls.items():
+            if fnmatch.fnmatchcase(path, pattern):
+                return ttl
+        return self.default_ttl
+
+    @classmethod
+    def credentials(cls, headers: dict) -> str:
+        """Hash of the credential headers, '' without any, so responses are only shared per credential"""
+        found = sorted((name.lower(), str(value)) for name, value in (headers or {}).items()
+                       if any(marker in name.lower() for marker in cls.CREDENTIAL_HEADERS))
+        if not found:
+            return ''
+        return hashlib.sha256(repr(found).encode()).hexdigest()[:32]
+
+    @classmethod
+    def key(cls, url: str, options: dict) -> str or None:
+        """
+        Cache key of a GET: url with params encoded into the query, plus a hash of the credential headers.
+        None if options make it uncacheable
+        """
+        if not cls.CACHEABLE_OPTIONS.issuperset(options):
+            return None
+        params = options.get('params', None)
+        key = requests.Request('GET', url, params=params).prepare().url if params else url
+        credentials = cls.credentials(options.get('headers', None))
+        return f'{key}#{credentials}' if credentials else key
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, entry: CacheEntry) -> None:
+        with self._lock:
+            self.entries[entry.key] = entry
+            self.entries.move_to_end(entry.key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def lookup(self, key: str, headers: dict = None) -> CacheEntry or None:
+        """Cached entry for key from memory or disk, fresh or not, None if it varies on other request headers"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.directory is not None:
+            filename = self._filehandler.check_filename(self._path(key))
+            if not os.path.exists(filename):
+                return None
+            data = self._filehandler.load_dict_from_file(filename)
+            if not data:
+                return None
+            entry = CacheEntry.from_dict(data)
+            if entry.key != key:
+                return None
+            self._remember(entry)
+            self._count('disk_hits')
+        if entry is None or not entry.matches(headers):
+            return None
+        return entry
+
+    def conditional_options(self, entry: CacheEntry, options: dict) -> dict:
+        """Add If-None-Match / If-Modified-Since for a stale entry"""
+        headers = dict(options.get('headers', None) or {})
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        options = options.copy()
+        options['headers'] = headers
+        return options
+
+    def store(self, key: str, response: requests.Response, headers: dict = None) -> None:
+        """Cache response to the GET for key, headers are the request headers it was sent with"""
+        if response.status_code != 200 or 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+        vary = [name.strip() for name in response.headers.get('Vary', '').split(',') if name.strip()]
+        if '*' in vary:
+            return
+        headers = CaseInsensitiveDict(headers or {})
+        entry = CacheEntry(url=response.url or key, status_code=response.status_code,
+                           headers=CaseInsensitiveDict(response.headers), content=response.content,
+                           stored=time.time(), ttl=self.ttl_for(key), key=key,
+                           vary={name.lower(): headers.get(name, None) for name in vary})
+        self._save(entry)
+        self._count('stores')
+
+    def _save(self, entry: CacheEntry) -> None:
+        self._remember(entry)
+        if self.directory is not None:
+            self._filehandler.save_data_to_file(entry.to_dict(), filename=self._path(entry.key))
+
+    def update(self, key: str, entry: CacheEntry or None, response: requests.Response, headers: dict = None) \
+            -> requests.Response:
+        """Handle the response to a (conditional) GET, returns the response the caller should see"""
+        if entry is not None and response.status_code == 304:
+            entry.headers.update(response.headers)
+            entry.stored = time.time()
+            entry.ttl = self.ttl_for(key)
+            self._save(entry)
+            self._count('revalidated')
+            return entry.to_response()
+        self._count('misses')
+        self.store(key, response, headers)
+        return response
+
+    def fresh_response(self, key: str, headers: dict = None) -> tuple[CacheEntry or None, requests.Response or None]:
+        """(entry, response) where response is set on a fresh hit"""
+        entry = self.lookup(key, headers)
+        if entry is not None and entry.fresh:
+            self._count('hits')
+            return entry, entry.to_response()
+        return entry, None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(self._filehandler.extension):
+                    os.remove(os.path.join(self.directory, name))
+
+
+# write_many method -> action batch operation
+ACTION_OPERATIONS = {'POST': 'create', 'PUT': 'update', 'PATCH': 'update', 'DELETE': 'destroy'}
+ACTION_BATCH_SIZE = 100             # actions per batch
+ACTION_BATCH_SIZE_SYNCHRONOUS = 20  # actions per synchronous batch
+
+
+class BatchItem(NamedTuple):
+    """
+    Outcome of one write_many payload. With action batches, response is the response of the batch holding
+    the item and batch its number, so every item of a rejected batch fails together.
+    """
+    index: int
+    url: str
+    payload: object = None
+    response: requests.Response = None
+    error: BaseException = None
+    batch: int = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.response is not None and self.response.ok
+
+
+class BatchResult:
+    """All write_many outcomes in input order"""
+
+    def __init__(self, items: list[BatchItem]):
+        self.items = sorted(items, key=lambda item: item.index)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def succeeded(self) -> list[BatchItem]:
+        return [item for item in self.items if item.ok]
+
+    @property
+    def failed(self) -> list[BatchItem]:
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def ok(self) -> bool:
+        return all(item.ok for item in self.items)
+
+    def summary(self) -> dict:
+        succeeded = len(self.succeeded)
+        return {'total': len(self.items), 'succeeded': succeeded, 'failed': len(self.items) - succeeded}
+
+
+class _WriteJob(NamedTuple):
+    """One request of write_many: a single write, or an action batch carrying several items"""
+    method: str
+    url: str
+    payload: object
+    items: list        # [(index, url, payload)]
+    batch: int = None
+
+
 class RequestHelper:
     __url: str = ""
     session_options: dict
@@ -24,12 +449,25 @@ class RequestHelper:
     def log(self, log):
         self._log = log
 
-    def __init__(self, headers: dict = None, **kargs):
+    def __init__(self, headers: dict = None, scheduler: RequestScheduler = None, cache: ResponseCache = None,
+                 **kargs):
         if headers is None:
             headers = {}
         self.session = requests.Session()
         self.headers = headers
         self.session_options = {'headers': self.headers}
+        if scheduler is None:
+            scheduler = RequestScheduler(rate=kargs.get('rate_limit', None), max_retries=kargs.get('max_retries', 3))
+        self.scheduler = scheduler
+        self.cache = cache
+        # gzip request bodies of at least this many bytes, None never compresses. The API has to accept
+        # 'Content-Encoding: gzip' request bodies
+        self.compress_threshold = kargs.get('compress_threshold', None)
+        self.pool_size = 10     # requests' default connection pool size
+
+    @property
+    def stats(self) -> dict:
+        return self.scheduler.stats.copy()
 
     @property
     def url(self):
@@ -39,16 +477,53 @@ class RequestHelper:
     def url(self, value: str):
         self.__url = value
 
+    def _options(self, headers: dict = None) -> dict:
+        if headers is None:
+            headers = {'headers': {}}
+        options = self.session_options.copy()
+        options.update(headers)
+        return options
+
     def _get(self, url, headers: dict = None) -> requests.Response:
         if headers is None:
             headers = {'headers': {}}
         silence_request_warnings()
         options = self.session_options.copy()
         options.update(headers)
-        response = self.session.get(url, **options)
-        self.log.debug(f"GET {url} response: {response.status_code}")
+        key = self.cache.key(url, options) if self.cache is not None else None
+        if key is None:
+            response = self._send('GET', url, **options)
+        else:
+            request_headers = options.get('headers', None)
+            entry, response = self.cache.fresh_response(key, request_headers)
+            if response is None:
+                send_options = self.cache.conditional_options(entry, options) if entry is not None else options
+                response = self.cache.update(key, entry, self._send('GET', url, **send_options), request_headers)
+        self.log.debug("GET %s response: %s", url, response.status_code)
         return response
 
+    def _send(self, method: str, url: str, retry: bool = None, **options) -> requests.Response:
+        """
+        Send request through the scheduler, retrying 429 and 5xx responses.
+        retry: retry 5xx responses, default only for idempotent methods
+        """
+        host = urlparse(url).netloc
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            delay = self.scheduler.reserve(host)
+            if delay > 0:
+                time.sleep(delay)
+            response = self.session.request(method, url, **options)
+            delay = self.scheduler.retry_delay(host, response, attempt, retry)
+            if delay is None:
+                return response
+            attempt += 1
+            self.log.info("%s %s response: %s, retry %s in %0.2fs",
+                          method, url, response.status_code, attempt, delay)
+            time.sleep(delay)
+
     def _continue_request(self, response, data: list, headers: dict) -> None:
         while True:
             _next = response['meta']['next']
@@ -65,25 +540,290 @@ class RequestHelper:
         options = self.session_options.copy()
         options.update(headers)
         response = self._get(url, options)
+        self._check_response(response)
+        return response
+
+    def _check_response(self, response: requests.Response) -> None:
         if response.status_code != 200:
-            self.log.warning(f"{response.status_code}")
-            if response.status_code > 500:
-                pass
+            self.log.warning('%s', response.status_code)
+            if response.status_code >= 500 or response.status_code == 429:
+                self.log.warning("%s still failing after %s retries", response.url, self.scheduler.max_retries)
             else:
                 pp(response.json())
-        return response
 
-    def post(self, url, data, headers: dict = None) -> requests.Response:
-        if headers is None:
-            headers = {'headers': {}}
+    @staticmethod
+    def _encode(payload) -> str or bytes or None:
+        """dict/list payloads as JSON, str/bytes as they are"""
+        if payload is None or isinstance(payload, (str, bytes, bytearray)):
+            return payload
+        return dumps(payload)
+
+    def _body(self, data, options: dict, compress: bool = None) -> tuple:
+        """(data, options), gzipped with a Content-Encoding header when compression applies"""
+        threshold = self.compress_threshold if compress is None else (0 if compress else None)
+        if threshold is None or data is None:
+            return data, options
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        if not isinstance(raw, (bytes, bytearray)) or len(raw) < threshold:
+            return data, options
+        headers = dict(options.get('headers') or {})
+        headers['Content-Encoding'] = 'gzip'
+        return gzip.compress(raw, compresslevel=5), {**options, 'headers': headers}
+
+    def _write(self, method: str, url: str, data=None, headers: dict = None, compress: bool = None,
+               retry: bool = None) -> requests.Response:
         silence_request_warnings()
-        url = self.url + url
-        options = self.session_options.copy()
-        options.update(headers)
-        response = self.session.post(url, data=data, **options)
-        log.debug(f'POST {url} response: {response.status_code}')
+        data, options = self._body(data, self._options(headers), compress)
+        if data is not None:
+            options['data'] = data
+        response = self._send(method, url, retry=retry, **options)
+        self.log.debug('%s %s response: %s', method, url, response.status_code)
         return response
 
+    def post(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return self._write('POST', self.url + url, data, headers, compress)
+
+    def put(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return self._write('PUT', self.url + url, data, headers, compress)
+
+    def patch(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return self._write('PATCH', self.url + url, data, headers, compress)
+
+    def delete(self, url, headers: dict = None) -> requests.Response:
+        return self._write('DELETE', self.url + url, headers=headers)
+
     def put_dict(self, url: str, data: dict) -> requests.Response:
         return self.put(url=url, data=dumps(data))
 
+    def _ensure_pool(self, size: int) -> None:
+        """Keep-alive pool large enough for 'size' concurrent requests, so connections are reused"""
+        if size <= self.pool_size:
+            return
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool_size = size
+
+    def _write_jobs(self, method: str, items, action_batch_url: str = None, batch_size: int = None,
+                    synchronous: bool = False) -> list[_WriteJob]:
+        items = [(index, url, payload) for index, (url, payload) in enumerate(items)]
+        method = method.upper()
+        if action_batch_url is None:
+            return [_WriteJob(method, self.url + url, payload, [(index, url, payload)])
+                    for index, url, payload in items]
+        operation = ACTION_OPERATIONS[method]
+        limit = ACTION_BATCH_SIZE_SYNCHRONOUS if synchronous else ACTION_BATCH_SIZE
+        size = min(batch_size or limit, limit)
+        jobs = []
+        for batch, start in enumerate(range(0, len(items), size)):
+            chunk = items[start:start + size]
+            actions = [{'resource': url, 'operation': operation} | ({'body': payload} if payload is not None else {})
+                       for _, url, payload in chunk]
+            body = {'confirmed': True, 'synchronous': synchronous, 'actions': actions}
+            jobs.append(_WriteJob('POST', self.url + action_batch_url, body, chunk, batch))
+        return jobs
+
+    @staticmethod
+    def _job_retry(job: _WriteJob, retry: bool = None) -> bool:
+        return job.method in IDEMPOTENT_METHODS if retry is None else retry
+
+    def _batch_result(self, jobs: list[_WriteJob], outcomes: list[tuple]) -> BatchResult:
+        items = [BatchItem(index, url, payload, response, error, job.batch)
+                 for job, (response, error) in zip(jobs, outcomes) for index, url, payload in job.items]
+        result = BatchResult(items)
+        if not result.ok:
+            self.log.warning('write_many: %s of %s writes failed', len(result.failed), len(result))
+        return result
+
+    def write_many(self, method: str, items, concurrency: int = 8, action_batch_url: str = None,
+                   batch_size: int = None, synchronous: bool = False, headers: dict = None,
+                   compress: bool = None, retry: bool = None) -> BatchResult:
+        """
+        Send many writes and report every item's outcome.
+        :param method: 'POST', 'PUT', 'PATCH' or 'DELETE'
+        :param items: iterable of (url, payload), url relative to self.url, payload dict/list (sent as JSON),
+            str/bytes, or None
+        :param concurrency: requests in flight on the pooled session, all still go through the scheduler
+        :param action_batch_url: send the items as action batches (e.g. '/organizations/{id}/actionBatches'):
+            each item becomes {'resource': url, 'operation': create/update/destroy, 'body': payload}
+        :param batch_size: actions per batch, at most 100 (20 when synchronous)
+        :param synchronous: synchronous action batches, the response reports the outcome of the actions
+        :param compress: gzip request bodies, default is per compress_threshold
+        :param retry: retry 5xx responses. Default only for idempotent requests (PUT/DELETE), never for POST/PATCH
+            or action batches (always a POST), a write the server applied before failing would be applied twice
+        :return: BatchResult with one BatchItem per item
+        """
+        jobs = self._write_jobs(method, items, action_batch_url, batch_size, synchronous)
+        self._ensure_pool(concurrency)
+
+        def send(job: _WriteJob) -> requests.Response:
+            return self._write(job.method, job.url, self._encode(job.payload), headers, compress,
+                               self._job_retry(job, retry))
+        tasks = fan_out(send, jobs, mode='thread', concurrency=concurrency)
+        return self._batch_result(jobs, [(task.result, task.error) for task in tasks])
+
+
+class AsyncRequestHelper(RequestHelper):
+    """
+    asyncio front end for RequestHelper, same url/headers API.
+    Requests run on a pooled keep-alive session in a worker thread pool, limited to 'concurrency' at a time.
+    """
+
+    def __init__(self, headers: dict = None, concurrency: int = 10, **kargs):
+        super().__init__(headers=headers, **kargs)
+        self.concurrency = concurrency
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool_size = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='AsyncRequestHelper')
+        self._semaphores: dict = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limit, one semaphore per running loop"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _send_async(self, method: str, url: str, retry: bool = None, **options) -> requests.Response:
+        """Async counterpart of RequestHelper._send, waits without holding a worker thread"""
+        silence_request_warnings()
+        host = urlparse(url).netloc
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            delay = self.scheduler.reserve(host)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            response = await self._run(self.session.request, method, url, **options)
+            delay = self.scheduler.retry_delay(host, response, attempt, retry)
+            if delay is None:
+                self.log.debug("%s %s response: %s", method, url, response.status_code)
+                return response
+            attempt += 1
+            self.log.info("%s %s response: %s, retry %s in %0.2fs",
+                          method, url, response.status_code, attempt, delay)
+            await asyncio.sleep(delay)
+
+    async def _get_async(self, url: str, headers: dict = None) -> requests.Response:
+        """Async counterpart of RequestHelper._get, including the response cache"""
+        options = self._options(headers)
+        key = self.cache.key(url, options) if self.cache is not None else None
+        if key is None:
+            return await self._send_async('GET', url, **options)
+        request_headers = options.get('headers', None)
+        entry, response = self.cache.fresh_response(key, request_headers)
+        if response is not None:
+            return response
+        send_options = self.cache.conditional_options(entry, options) if entry is not None else options
+        return self.cache.update(key, entry, await self._send_async('GET', url, **send_options), request_headers)
+
+    async def get(self, url, headers: dict = None) -> requests.Response:
+        response = await self._get_async(self.url + url, headers)
+        self._check_response(response)
+        return response
+
+    async def _write_async(self, method: str, url: str, data=None, headers: dict = None,
+                           compress: bool = None, retry: bool = None) -> requests.Response:
+        data, options = self._body(data, self._options(headers), compress)
+        if data is not None:
+            options['data'] = data
+        return await self._send_async(method, url, retry=retry, **options)
+
+    async def post(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return await self._write_async('POST', self.url + url, data, headers, compress)
+
+    async def put(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return await self._write_async('PUT', self.url + url, data, headers, compress)
+
+    async def patch(self, url, data, headers: dict = None, compress: bool = None) -> requests.Response:
+        return await self._write_async('PATCH', self.url + url, data, headers, compress)
+
+    async def delete(self, url, headers: dict = None) -> requests.Response:
+        return await self._write_async('DELETE', self.url + url, headers=headers)
+
+    async def write_many(self, method: str, items, action_batch_url: str = None, batch_size: int = None,
+                         synchronous: bool = False, headers: dict = None, compress: bool = None,
+                         retry: bool = None) -> BatchResult:
+        """Async RequestHelper.write_many, concurrency is the helper's concurrency"""
+        jobs = self._write_jobs(method, items, action_batch_url, batch_size, synchronous)
+
+        async def send(job: _WriteJob) -> tuple:
+            try:
+                return await self._write_async(job.method, job.url, self._encode(job.payload), headers, compress,
+                                               self._job_retry(job, retry)), None
+            except Exception as e:
+                return None, e
+        return self._batch_result(jobs, await asyncio.gather(*(send(job) for job in jobs)))
+
+    async def get_many(self, urls: list[str], headers: dict = None) -> list[requests.Response]:
+        """GET several urls concurrently, responses are returned in the order of urls"""
+        return await asyncio.gather(*(self.get(url, headers) for url in urls))
+
+    @staticmethod
+    def _next_link(response: requests.Response, body) -> str or None:
+        """Next page from body meta.next (see RequestHelper._continue_request), or the Link header"""
+        if isinstance(body, dict) and isinstance(body.get('meta', None), dict):
+            return body['meta'].get('next', None)
+        return response.links.get('next', {}).get('url', None)
+
+    async def paginate(self, url, headers: dict = None):
+        """
+        Async generator yielding one page of data at a time as it arrives.
+        The next page is already downloading while the caller processes the current one.
+        """
+        response = await self.get(url, headers)
+        while True:
+            if response.status_code != 200:
+                self.log.warning("Pagination stopped, %s response: %s", response.url, response.status_code)
+                return
+            body = response.json()
+            _next = self._next_link(response, body)
+            pending = asyncio.ensure_future(self._get_async(_next, headers)) if _next else None
+            try:
+                yield body.get('data', body) if isinstance(body, dict) else body
+            except BaseException:
+                if pending is not None:
+                    pending.cancel()
+                raise
+            if pending is None:
+                return
+            response = await pending
+
+    async def get_all(self, url, headers: dict = None) -> list or dict:
+        """
+        Follow all pages and return the combined data. List pages are concatenated, an endpoint answering
+        with a single dict (no further pages) returns that dict as is.
+        """
+        data = None
+        async for page in self.paginate(url, headers):
+            if isinstance(page, list) and data is None:
+                data = list(page)
+            elif isinstance(page, list) and isinstance(data, list):
+                data.extend(page)
+            elif data is None:
+                data = page
+            else:
+                raise TypeError(f"get_all: can't combine {type(data).__name__} and {type(page).__name__} pages "
+                                f"of {url}, use paginate() for non-list pages")
+        return data if data is not None else []
+
@@ -1,46 +1,94 @@
+import bisect
 import datetime
+import inspect
+import logging
+import operator
 import re
+import socket
+import sys
 import time
 import os
-import logzero
 import functools
 import pprint
+from array import array
+from typing import NamedTuple
 
-DEBUG = logzero.DEBUG           # 10
-INFO = logzero.INFO             # 20
-WARN = logzero.WARN             # 30
-ERROR = logzero.ERROR           # 40
-CRITICAL = logzero.CRITICAL     # 50
+from Robs_Toolbox2.profiling import profiler
+
+# asyncio, concurrent.futures and logzero are imported on first use, they dominate import time
+
+DEBUG = logging.DEBUG           # 10
+INFO = logging.INFO             # 20
+WARN = logging.WARN             # 30
+ERROR = logging.ERROR           # 40
+CRITICAL = logging.CRITICAL     # 50
 
 log_format = '%(color)s[%(levelname)1.1s %(asctime)s %(module)s:%(lineno)d]%(end_color)s ' \
              '%(funcName)s :: %(message)s'
-logzero.setup_default_logger(formatter=logzero.LogFormatter(fmt=log_format))
-log = logzero.logger
+
+
+def setup_logger() -> logging.Logger:
+    """Configure and return the logzero default logger, done once on first use of log"""
+    import logzero
+    logger = logzero.logger
+    if not getattr(logger, '_rtb_configured', False):
+        logzero.setup_default_logger(formatter=logzero.LogFormatter(fmt=log_format))
+        logger = logzero.logger
+        logger._rtb_configured = True
+    return logger
+
+
+class DeferredLogger:
+    """
+    Stands in for logzero.logger until it is first used, so importing the toolbox neither imports
+    logzero nor touches logging configuration. Logger methods are cached after the first call.
+    """
+
+    def __getattr__(self, name):
+        value = getattr(setup_logger(), name)
+        if callable(value):
+            self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(setup_logger(), name, value)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({setup_logger()!r})'
+
+
+log = DeferredLogger()
 
 
 def pp(*args, **kwargs):
     print(pprint.pformat(*args, **kwargs))
 
 
+def _loglevel(args) -> int or None:
+    """'_loglevel' of the instance a method was called on, None for free functions"""
+    return getattr(args[0], '_loglevel', None) if args else None
+
+
 def my_time(func):
     """
-    Wrapper to display the function runtime
+    Wrapper to record the function runtime in profiling.profiler and log it at DEBUG
+    Not logged when the instance has a '_loglevel' above DEBUG. With profiler disabled it does neither
     :param func: Function to be wrapped
     :return:
     """
+    name = func.__qualname__
 
     @functools.wraps(func)
     def wrapper_timer(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
         tic = time.perf_counter()
-        loglevel = args[0].__dict__.get('_loglevel', None)
         value = func(*args, **kwargs)
-        toc = time.perf_counter()
-        elapsed_time = toc - tic
-        if loglevel is None:
-            print(f"{func.__name__} Elapsed time: {elapsed_time:0.4f} seconds")
-        else:
-            if loglevel <= 10:
-                print(f"{func.__name__} Elapsed time: {elapsed_time:0.4f} seconds")
+        elapsed_time = time.perf_counter() - tic
+        profiler.record(name, elapsed_time)
+        loglevel = _loglevel(args)
+        if loglevel is None or loglevel <= 10:
+            log.debug('%s Elapsed time: %0.4f seconds', func.__name__, elapsed_time)
         return value
 
     return wrapper_timer
@@ -48,41 +96,282 @@ def my_time(func):
 
 def my_async_time(func):
     """
-    Wrapper to display asyncio function runtime
+    Wrapper to record asyncio function runtime in profiling.profiler and log it at DEBUG, see my_time
     :param func:
     :return:
     """
+    name = func.__qualname__
 
     @functools.wraps(func)
     async def wrapper_timer(*args, **kwargs):
+        if not profiler.enabled:
+            return await func(*args, **kwargs)
         tic = time.perf_counter()
-        loglevel = args[0].__dict__.get('_loglevel', None)
-        # print("loglevel", loglevel)
         value = await func(*args, **kwargs)
-        toc = time.perf_counter()
-        elapsed_time = toc - tic
-        if loglevel is None:
-            print(f"{func.__name__} Elapsed time: {elapsed_time:0.4f} seconds")
-        else:
-            if loglevel <= 10:
-                print(f"{func.__name__} X Elapsed time: {elapsed_time:0.4f} seconds")
+        elapsed_time = time.perf_counter() - tic
+        profiler.record(name, elapsed_time)
+        loglevel = _loglevel(args)
+        if loglevel is None or loglevel <= 10:
+            log.debug('%s Elapsed time: %0.4f seconds', func.__name__, elapsed_time)
         return value
 
     return wrapper_timer
 
 
+def _loop_is_running() -> bool:
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
 def run_in_loop(f):
     # Run async coroutine in async loop, unless loop already running
+    # Uses the handler's .loop when it has one, otherwise a fresh loop via asyncio.run
+    @functools.wraps(f)
     def wrapper(*args, **kwargs):
-        api_handler = args[0]
-        if api_handler.loop.is_running():
+        import asyncio
+        loop = getattr(args[0], 'loop', None) if args else None
+        if loop is None:
+            if _loop_is_running():
+                return f(*args, **kwargs)
+            print(f"Running {f.__name__} in async loop")
+            return asyncio.run(f(*args, **kwargs))
+        if loop.is_running():
             return f(*args, **kwargs)
         else:
             print(f"Running {f.__name__} in async loop")
-            return api_handler.loop.run_until_complete(f(*args, **kwargs))
+            return loop.run_until_complete(f(*args, **kwargs))
     return wrapper
 
 
+class FanOutTask(NamedTuple):
+    """Outcome of one fan_out call: result is set on success, error on failure or timeout"""
+    index: int
+    item: object
+    result: object = None
+    error: BaseException = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class FanOutError(Exception):
+    """Raised by FanOutResult.raise_errors, .errors holds every failed FanOutTask"""
+
+    def __init__(self, errors: list[FanOutTask]):
+        self.errors = errors
+        first = errors[0]
+        super().__init__(f"{len(errors)} task(s) failed, first: item {first.item!r}: {first.error!r}")
+
+
+class FanOutResult:
+    """All fan_out outcomes in input order"""
+
+    def __init__(self, tasks: list[FanOutTask]):
+        self.tasks = sorted(tasks, key=lambda task: task.index)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    @property
+    def results(self) -> list:
+        """Results in input order, None where the task failed"""
+        return [task.result for task in self.tasks]
+
+    @property
+    def errors(self) -> list[FanOutTask]:
+        return [task for task in self.tasks if not task.ok]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def raise_errors(self) -> 'FanOutResult':
+        errors = self.errors
+        if errors:
+            raise FanOutError(errors)
+        return self
+
+
+def _ordered(tasks, ordered: bool):
+    """Pass tasks through as they complete, or buffer them to release in input order"""
+    if not ordered:
+        yield from tasks
+        return
+    buffer = {}
+    next_index = 0
+    for task in tasks:
+        buffer[task.index] = task
+        while next_index in buffer:
+            yield buffer.pop(next_index)
+            next_index += 1
+
+
+async def _fan_out_async_completed(func, items, concurrency: int, timeout: float or None):
+    import asyncio
+    semaphore = asyncio.Semaphore(concurrency)
+    is_coroutine = inspect.iscoroutinefunction(func)
+
+    async def run(index, item) -> FanOutTask:
+        async with semaphore:
+            call = func(item) if is_coroutine else asyncio.to_thread(func, item)
+            try:
+                result = await asyncio.wait_for(call, timeout) if timeout is not None else await call
+                return FanOutTask(index, item, result)
+            except asyncio.TimeoutError:
+                return FanOutTask(index, item, error=TimeoutError(f"Timed out after {timeout}s"))
+            except Exception as e:
+                return FanOutTask(index, item, error=e)
+
+    pending = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for future in asyncio.as_completed(pending):
+            yield await future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def fan_out_async(func, items, concurrency: int = 10, timeout: float = None, ordered: bool = True):
+    """
+    Async generator running func(item) for every item with at most 'concurrency' in flight.
+    Coroutine functions are awaited, plain functions run in a worker thread (asyncio.to_thread).
+    Yields FanOutTask in input order (ordered=True) or as they complete.
+    """
+    buffer = {}
+    next_index = 0
+    async for task in _fan_out_async_completed(func, items, concurrency, timeout):
+        if not ordered:
+            yield task
+            continue
+        buffer[task.index] = task
+        while next_index in buffer:
+            yield buffer.pop(next_index)
+            next_index += 1
+
+
+async def fan_out_gather(func, items, concurrency: int = 10, timeout: float = None) -> FanOutResult:
+    """Collect fan_out_async into a FanOutResult, usable inside @run_in_loop methods"""
+    return FanOutResult([task async for task in fan_out_async(func, items, concurrency, timeout, ordered=False)])
+
+
+def _timed_call(func, starts: dict, index: int, item):
+    """Worker side of _fan_out_pool, records when the call really starts"""
+    starts[index] = time.monotonic()
+    return func(item)
+
+
+def _fan_out_pool(func, items, executor, concurrency: int, timeout: float or None):
+    """
+    Run on executor with a sliding window of 'concurrency' submissions, yield FanOutTask as completed.
+    An item is only submitted once a worker is free, and its timeout runs from the moment func starts
+    (recorded in the worker for threads, the submission for processes, which then starts right away).
+    A timed out call keeps its worker until it returns, that worker counts as busy meanwhile.
+    """
+    import concurrent.futures
+    items = enumerate(items)
+    pending: dict = {}  # future -> (index, item, submitted)
+    starts: dict = {}   # index -> monotonic start time, written by the worker threads
+    overdue: set = set()    # timed out futures still holding a worker
+    record_start = isinstance(executor, concurrent.futures.ThreadPoolExecutor)
+    exhausted = False
+    while True:
+        overdue = {future for future in overdue if not future.done()}
+        while not exhausted and len(pending) + len(overdue) < concurrency:
+            try:
+                index, item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            if record_start:
+                future = executor.submit(_timed_call, func, starts, index, item)
+            else:
+                future = executor.submit(func, item)
+            pending[future] = (index, item, time.monotonic())
+        if not pending and (exhausted or not overdue):
+            return
+        wait = None
+        if timeout is not None and pending:
+            deadline = min(starts.get(index, submitted) for index, _, submitted in pending.values()) + timeout
+            wait = max(0.0, deadline - time.monotonic())
+        done, _ = concurrent.futures.wait(set(pending) | overdue, timeout=wait,
+                                          return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future not in pending:   # an overdue call finished, its worker is free again
+                continue
+            index, item, _ = pending.pop(future)
+            starts.pop(index, None)
+            try:
+                yield FanOutTask(index, item, future.result())
+            except Exception as e:
+                yield FanOutTask(index, item, error=e)
+        if timeout is not None:
+            now = time.monotonic()
+            for future, (index, item, submitted) in list(pending.items()):
+                if starts.get(index, submitted) + timeout <= now:
+                    del pending[future]
+                    starts.pop(index, None)
+                    if not future.cancel():
+                        overdue.add(future)
+                    yield FanOutTask(index, item, error=TimeoutError(f"Timed out after {timeout}s"))
+
+
+def _fan_out_iter(func, items, mode: str, concurrency: int, timeout: float or None, ordered: bool):
+    import asyncio
+    import concurrent.futures
+    if mode == 'async':
+        if _loop_is_running():
+            raise RuntimeError("fan_out(mode='async') called inside a running loop, use fan_out_async")
+        loop = asyncio.new_event_loop()
+        agen = fan_out_async(func, items, concurrency, timeout, ordered)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+    if mode == 'thread':
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    elif mode == 'process':
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=concurrency)
+    else:
+        raise ValueError(f"Unknown fan_out mode '{mode}', use 'async', 'thread' or 'process'")
+    try:
+        yield from _ordered(_fan_out_pool(func, items, executor, concurrency, timeout), ordered)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fan_out(func, items, mode: str = 'thread', concurrency: int = 10, timeout: float = None,
+            ordered: bool = True, stream: bool = False):
+    """
+    Run func(item) for every item concurrently.
+    :param func: callable taking one item. mode='process' needs a picklable (module level) function
+    :param items: iterable of items
+    :param mode: 'async' (coroutine functions, or blocking functions in threads), 'thread' for blocking calls
+        such as RequestHelper.get, 'process' for CPU bound transforms
+    :param concurrency: max calls in flight
+    :param timeout: per call timeout in seconds, failed calls get a TimeoutError
+    :param ordered: stream in input order, or as completed
+    :param stream: return a generator of FanOutTask instead of a FanOutResult
+    :return: FanOutResult, or generator of FanOutTask if stream
+    """
+    tasks = _fan_out_iter(func, items, mode, concurrency, timeout, ordered)
+    if stream:
+        return tasks
+    return FanOutResult(list(tasks))
+
+
 class EnvironmentTools:
 
     @staticmethod
@@ -94,10 +383,10 @@ class EnvironmentTools:
         """
         try:
             osvar = os.environ[variable]
-            log.debug(f"Returning OS variable '{variable}'.")
+            log.debug("Returning OS variable '%s'.", variable)
             return osvar
         except KeyError:
-            log.warning(f"Unable to find OS variable '{variable}'.")
+            log.warning("Unable to find OS variable '%s'.", variable)
         return None
 
     @staticmethod
@@ -110,15 +399,15 @@ class EnvironmentTools:
         """
         exists = os.path.isdir(outfolder)
         if exists:
-            log.debug(f"Folder '{outfolder}' already exists.")
+            log.debug("Folder '%s' already exists.", outfolder)
             return True
-        log.debug(f"Folder '{outfolder}' does not exist.")
+        log.debug("Folder '%s' does not exist.", outfolder)
         try:
             os.mkdir(outfolder)
-            log.debug(f"Folder '{outfolder}' created.")
+            log.debug("Folder '%s' created.", outfolder)
             return True
         except Exception as e:
-            log.warning(f"Unable to create directory '{outfolder}': {e}")
+            log.warning("Unable to create directory '%s': %s", outfolder, e)
         return False
 
     @staticmethod
@@ -131,16 +420,16 @@ class EnvironmentTools:
         """
         exists = os.path.isfile(filename)
         if exists:
-            log.debug(f"File '{filename}' already exists.")
+            log.debug("File '%s' already exists.", filename)
             return True
-        log.debug(f"File '{filename}' does not exist.")
+        log.debug("File '%s' does not exist.", filename)
         if create_file:
             try:
                 with open(filename, 'w') as f:
-                    log.debug(f"File '{filename}' created.")
+                    log.debug("File '%s' created.", filename)
                 return True
             except Exception as e:
-                log.warning(f"Unable to create file '{filename}': {e}")
+                log.warning("Unable to create file '%s': %s", filename, e)
         return False
 
 
@@ -149,6 +438,8 @@ class StringTools:
     REGX_MAC = r'^([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$'
     REGX_MACALT = r'^([0-9a-fA-F]{2}-){5}[0-9a-fA-F]{2}$'
     REGX_JUNOSPORT = r'ge-\d\/\d\/(\d|[1-3]\d|4[0-7]'
+    _mac_colon = re.compile(REGX_MAC)
+    _mac_dash = re.compile(REGX_MACALT)
 
     @staticmethod
     def convert_mac(mac: str, upper: bool = False) -> str:
@@ -158,9 +449,9 @@ class StringTools:
         :return:
         """
         output = ''
-        if re.findall(StringTools.REGX_MAC, mac):
+        if StringTools._mac_colon.match(mac):
             output = mac.replace(':', '-')
-        elif re.findall(StringTools.REGX_MACALT, mac):
+        elif StringTools._mac_dash.match(mac):
             output = mac.replace('-', ':')
         elif len(mac) == 12:  # no separation
             mac = [mac[i:i + 2] for i in range(0, len(mac), 2)]
@@ -178,9 +469,7 @@ class StringTools:
         :param ip:
         :return:
         """
-        if re.findall(StringTools.REGX_IP, ip):
-            return True
-        return False
+        return IPv4Tools.to_int(ip) is not None
 
     @staticmethod
     def sort_ipv4_addresses(ips: list[str], verify: bool = True) -> list[str]:
@@ -190,11 +479,7 @@ class StringTools:
         :param verify: Verify that values are valid IPv4 addresses.
         :return: Sorted list of Strings
         """
-        if verify:
-            ips = [ip for ip in ips if StringTools.is_ipv4_address(ip)]
-        for i in range(3, -1, -1):
-            ips = sorted(ips, key=lambda x: int(x.split('.')[i]))
-        return ips
+        return IPv4Tools.sort(ips, verify=verify)
 
     @staticmethod
     def xstr(original: str, replacement: str = '') -> str:
@@ -211,7 +496,699 @@ class StringTools:
     @staticmethod
     def convert_str_to_datetime(datestr: str) -> datetime.datetime:
         """Convert date string to datetime.datetime object"""
-        return datetime.datetime.strptime(datestr, "%Y-%m-%d %H:%M:%S.%f")
+        try:
+            return datetime.datetime.fromisoformat(datestr)  # fast path, covers str(datetime) output
+        except ValueError:
+            return datetime.datetime.strptime(datestr, "%Y-%m-%d %H:%M:%S.%f")
+
+
+_numpy = None
+
+
+def _load_numpy():
+    """Import numpy on first use, False if not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+class IPv4Tools:
+    """
+    Batch IPv4 helpers. Addresses are parsed once into packed unsigned 32 bit integers:
+    a numpy uint32 array when numpy is installed (and use_numpy is set), array('I') otherwise.
+    Valid addresses are dotted quads of 0-255 without leading zeros.
+    """
+    use_numpy = True
+    _typecode = 'I' if array('I').itemsize == 4 else 'L'
+
+    @staticmethod
+    def to_int(ip: str) -> int or None:
+        """Single address to int, None if not a valid address"""
+        try:
+            return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except (OSError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def to_str(value: int) -> str:
+        return socket.inet_ntoa(int(value).to_bytes(4, 'big'))
+
+    @staticmethod
+    def _numpy():
+        return _load_numpy() if IPv4Tools.use_numpy else False
+
+    @staticmethod
+    def to_ints(ips) -> tuple:
+        """
+        Parse addresses in a single pass.
+        :return: (values, positions) - packed ints of the valid addresses and their positions in ips
+        """
+        pton = socket.inet_pton
+        af_inet = socket.AF_INET
+        packed = bytearray()
+        positions = []
+        for pos, ip in enumerate(ips):
+            try:
+                packed += pton(af_inet, ip)
+            except (OSError, TypeError, ValueError):
+                continue
+            positions.append(pos)
+        np = IPv4Tools._numpy()
+        if np:
+            return np.frombuffer(bytes(packed), dtype='>u4').astype(np.uint32), positions
+        values = array(IPv4Tools._typecode)
+        values.frombytes(bytes(packed))
+        if sys.byteorder == 'little':
+            values.byteswap()
+        return values, positions
+
+    @staticmethod
+    def to_strs(values) -> list[str]:
+        ntoa = socket.inet_ntoa
+        return [ntoa(int(value).to_bytes(4, 'big')) for value in values]
+
+    @staticmethod
+    def validate(ips: list[str]) -> list[bool]:
+        valid = [False] * len(ips)
+        for pos in IPv4Tools.to_ints(ips)[1]:
+            valid[pos] = True
+        return valid
+
+    @staticmethod
+    def _parse(ips: list[str], verify: bool) -> tuple:
+        values, positions = IPv4Tools.to_ints(ips)
+        if not verify and len(positions) != len(ips):
+            valid = set(positions)
+            bad = next(ip for pos, ip in enumerate(ips) if pos not in valid)
+            raise ValueError(f"'{bad}' is not a valid IPv4 address")
+        return values, positions
+
+    @staticmethod
+    def sort(ips: list[str], verify: bool = True) -> list[str]:
+        """
+        Sort addresses numerically, invalid addresses are dropped (verify=True) or raise ValueError.
+        The original strings are returned.
+        """
+        values, positions = IPv4Tools._parse(ips, verify)
+        np = IPv4Tools._numpy()
+        if np:
+            order = np.argsort(values, kind='stable').tolist()
+        else:
+            order = sorted(range(len(values)), key=values.__getitem__)
+        return [ips[positions[i]] for i in order]
+
+    @staticmethod
+    def unique(ips: list[str], sort: bool = False) -> list[str]:
+        """Drop invalid and duplicate addresses, keeping first occurrences in order (or sorted)"""
+        values, positions = IPv4Tools.to_ints(ips)
+        np = IPv4Tools._numpy()
+        if np:
+            uniq, first = np.unique(values, return_index=True)
+            first = first.tolist() if sort else sorted(first.tolist())
+        else:
+            seen = {}
+            for i, value in enumerate(values):
+                seen.setdefault(value, i)
+            first = [seen[value] for value in sorted(seen)] if sort else list(seen.values())
+        return [ips[positions[i]] for i in first]
+
+    @staticmethod
+    def parse_cidr(cidr: str) -> tuple[int, int]:
+        """'10.0.0.0/8' -> (network, netmask) as ints, host bits of the address are ignored"""
+        address, _, prefix = cidr.partition('/')
+        network = IPv4Tools.to_int(address)
+        prefix = int(prefix) if prefix else 32
+        if network is None or not 0 <= prefix <= 32:
+            raise ValueError(f"'{cidr}' is not a valid IPv4 network")
+        mask = (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+        return network & mask, mask
+
+    @staticmethod
+    def in_subnet(ips: list[str], cidrs: str or list[str]) -> list[bool]:
+        """Membership of each address in any of cidrs, invalid addresses are False"""
+        if isinstance(cidrs, str):
+            cidrs = [cidrs]
+        networks = [IPv4Tools.parse_cidr(cidr) for cidr in cidrs]
+        values, positions = IPv4Tools.to_ints(ips)
+        np = IPv4Tools._numpy()
+        if np:
+            member = np.zeros(len(values), dtype=bool)
+            for network, mask in networks:
+                member |= (values & np.uint32(mask)) == np.uint32(network)
+            member = member.tolist()
+        else:
+            member = [any(value & mask == network for network, mask in networks) for value in values]
+        result = [False] * len(ips)
+        for pos, flag in zip(positions, member):
+            result[pos] = flag
+        return result
+
+    @staticmethod
+    def filter_subnet(ips: list[str], cidrs: str or list[str]) -> list[str]:
+        """Addresses that are inside any of cidrs"""
+        return [ip for ip, member in zip(ips, IPv4Tools.in_subnet(ips, cidrs)) if member]
+
+
+class MacTools:
+    """
+    Batch MAC address helpers. Any common format is accepted:
+    'aa:bb:cc:dd:ee:ff', 'aa-bb-cc-dd-ee-ff', 'aabb.ccdd.eeff' (Cisco), 'aabbccddeeff' (bare).
+    Addresses are normalized to 48 bit ints, packed in array('Q') for batches.
+    """
+    _strip = str.maketrans('', '', ':-. ')
+    _hex12 = re.compile(r'[0-9A-Fa-f]{12}')    # int(x, 16) alone would also take '0x', '+' and whitespace
+    STYLES = ('colon', 'dash', 'cisco', 'bare')
+
+    @staticmethod
+    def to_int(mac: str) -> int or None:
+        """Single address to int, None if not a valid address"""
+        try:
+            bare = mac.translate(MacTools._strip)
+        except (AttributeError, TypeError):
+            return None
+        if MacTools._hex12.fullmatch(bare) is None:
+            return None
+        return int(bare, 16)
+
+    @staticmethod
+    def to_str(value: int, style: str = 'colon', upper: bool = False) -> str:
+        """int to 'colon', 'dash', 'cisco' or 'bare' formatted string"""
+        bare = f'{value:012X}' if upper else f'{value:012x}'
+        if style == 'bare':
+            return bare
+        if style == 'cisco':
+            return f'{bare[0:4]}.{bare[4:8]}.{bare[8:12]}'
+        sep = '-' if style == 'dash' else ':'
+        return sep.join((bare[0:2], bare[2:4], bare[4:6], bare[6:8], bare[8:10], bare[10:12]))
+
+    @staticmethod
+    def to_ints(macs) -> tuple:
+        """
+        Parse addresses in a single pass.
+        :return: (values, positions) - array('Q') of the valid addresses and their positions in macs
+        """
+        strip = MacTools._strip
+        hex12 = MacTools._hex12.fullmatch
+        values = array('Q')
+        positions = []
+        for pos, mac in enumerate(macs):
+            try:
+                bare = mac.translate(strip)
+            except (AttributeError, TypeError):
+                continue
+            if hex12(bare) is not None:
+                values.append(int(bare, 16))
+                positions.append(pos)
+        return values, positions
+
+    @staticmethod
+    def to_strs(values, style: str = 'colon', upper: bool = False) -> list[str]:
+        to_str = MacTools.to_str
+        return [to_str(value, style, upper) for value in values]
+
+    @staticmethod
+    def normalize(macs, style: str = 'colon', upper: bool = False) -> list[str or None]:
+        """Reformat every address, invalid ones become None so positions line up with macs"""
+        to_int = MacTools.to_int
+        to_str = MacTools.to_str
+        output = []
+        for mac in macs:
+            value = to_int(mac)
+            output.append(None if value is None else to_str(value, style, upper))
+        return output
+
+    @staticmethod
+    def validate(macs) -> list[bool]:
+        to_int = MacTools.to_int
+        return [to_int(mac) is not None for mac in macs]
+
+    @staticmethod
+    def unique(macs, style: str = 'colon', upper: bool = False) -> list[str]:
+        """Normalized addresses without invalid or duplicate entries, first occurrences in order"""
+        values = dict.fromkeys(MacTools.to_ints(macs)[0])
+        return MacTools.to_strs(values, style, upper)
+
+    @staticmethod
+    def oui(value: int) -> int:
+        """24 bit vendor prefix of a MAC int"""
+        return value >> 24
+
+
+_HEX_DIGITS = re.compile(r'[0-9A-Fa-f]+')
+_OUI_HEX_LINE = re.compile(r'([0-9A-Fa-f]{2}-[0-9A-Fa-f]{2}-[0-9A-Fa-f]{2})\s+\(hex\)\s*(.*)')
+_OUI_PREFIX = re.compile(r'[0-9A-Fa-f]{2}(?:[:.-]?[0-9A-Fa-f]{2}){2,5}(?:/\d{1,2})?')
+
+
+class OUIIndex:
+    """
+    In memory vendor prefix index for bulk vendor lookups, loaded from a local file.
+    Understands the IEEE oui.txt '(hex)' lines, Wireshark 'manuf' files (including /28 and /36 prefixes)
+    and simple 'prefix,vendor' CSV files. Longest prefix wins.
+    Prefixes are at least 24 bits unless they carry an explicit /bits mask, other lines (such as the address
+    lines of oui.txt) are skipped.
+    """
+
+    def __init__(self, filename: str = None):
+        self.prefixes: dict[int, dict[int, str]] = {}   # prefix length in bits -> {prefix: vendor}
+        if filename is not None:
+            self.load(filename)
+
+    def __len__(self):
+        return sum(len(prefixes) for prefixes in self.prefixes.values())
+
+    def add(self, prefix: str, vendor: str) -> bool:
+        """Add 'AA:BB:CC', 'AABBCC', 'AA-BB-CC' or 'AA:BB:CC:D0:00:00/28' style prefix"""
+        prefix, _, bits = prefix.partition('/')
+        digits = prefix.translate(MacTools._strip)
+        if _HEX_DIGITS.fullmatch(digits) is None or len(digits) > 12:
+            return False
+        if not bits and len(digits) < 6:     # shorter than an OUI needs an explicit mask
+            return False
+        if bits and not bits.isdigit():
+            return False
+        value = int(digits, 16)
+        bits = int(bits) if bits else len(digits) * 4
+        if not 0 < bits <= 48:
+            return False
+        value = (value << (48 - len(digits) * 4)) >> (48 - bits)
+        self.prefixes.setdefault(bits, {})[value] = vendor.strip()
+        return True
+
+    def load(self, filename: str) -> int:
+        """Load vendor file, returns number of prefixes added"""
+        added = 0
+        with open(filename, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                match = _OUI_HEX_LINE.fullmatch(line)
+                if match is not None:   # IEEE: 00-00-0C   (hex)\t\tCisco Systems, Inc
+                    prefix, vendor = match.groups()
+                elif ',' in line and '\t' not in line:
+                    prefix, _, vendor = line.partition(',')
+                else:                   # manuf: 00:00:0C<tab>Cisco<tab>Cisco Systems, Inc
+                    fields = line.split('\t') if '\t' in line else line.split(None, 1)
+                    if len(fields) < 2:
+                        continue
+                    prefix, vendor = fields[0], fields[-1]
+                prefix = prefix.strip()
+                if not _OUI_PREFIX.fullmatch(prefix):   # oui.txt address and '(base 16)' lines
+                    continue
+                added += self.add(prefix, vendor.strip().strip('"'))
+        return added
+
+    def lookup(self, mac: str or int) -> str or None:
+        value = mac if isinstance(mac, int) else MacTools.to_int(mac)
+        if value is None:
+            return None
+        for bits in sorted(self.prefixes, reverse=True):
+            vendor = self.prefixes[bits].get(value >> (48 - bits))
+            if vendor is not None:
+                return vendor
+        return None
+
+    def lookup_many(self, macs) -> list[str or None]:
+        """Vendor for every address, None when unknown or invalid"""
+        lengths = [(48 - bits, self.prefixes[bits]) for bits in sorted(self.prefixes, reverse=True)]
+        to_int = MacTools.to_int
+        output = []
+        for mac in macs:
+            value = mac if isinstance(mac, int) else to_int(mac)
+            vendor = None
+            if value is not None:
+                for shift, prefixes in lengths:
+                    vendor = prefixes.get(value >> shift)
+                    if vendor is not None:
+                        break
+            output.append(vendor)
+        return output
+
+
+_UNHASHABLE = object()     # hash index marker for unhashable values, can't collide with a real value
+
+
+class IndexedRecords:
+    """
+    Indexed, read-mostly view of a list of dicts.
+    Indexes are built lazily per key on first lookup and reused afterwards:
+        - hash index: exact value -> positions, used for equality
+        - sorted index: sorted distinct values, used for prefix and range lookups
+        - n-gram index: n-gram -> distinct values, used for substring search
+    Results are always returned in original list order.
+    The DataHandler.search_list_of_dicts_* functions dispatch to this when handed one, where the index gives
+    the same result as the linear scan, otherwise they scan the records as for a list.
+    """
+
+    def __init__(self, records: list[dict] = None, ngram: int = 3):
+        self.records: list[dict] = list(records) if records is not None else []
+        self.ngram = ngram
+        self._hash: dict = {}       # key -> {value: [positions]}
+        self._text: dict = {}       # key -> {xstr(value): [positions]}
+        self._sorted: dict = {}     # key -> sorted list of distinct text values
+        self._numeric: dict = {}    # key -> (sorted distinct numbers, {number: [positions]})
+        self._grams: dict = {}      # key -> {gram: set(text values)}
+        self._kinds: dict = {}      # key -> (every record has key, every value is a str)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(records={len(self.records)}, indexed_keys={sorted(self._text)})"
+
+    def append(self, record: dict) -> None:
+        self.extend([record])
+
+    def extend(self, records: list[dict]) -> None:
+        """Add records, built indexes are dropped and rebuilt on next lookup"""
+        self.records.extend(records)
+        self.clear_indexes()
+
+    def clear_indexes(self) -> None:
+        for index in (self._hash, self._text, self._sorted, self._numeric, self._grams, self._kinds):
+            index.clear()
+
+    # ---- index builders ----
+
+    def _hash_index(self, key: str) -> dict:
+        index = self._hash.get(key)
+        if index is None:
+            index = {}
+            for pos, item in enumerate(self.records):
+                value = item.get(key, None)
+                try:
+                    index.setdefault(value, []).append(pos)
+                except TypeError:  # unhashable (list/dict) values are stored by their string form
+                    index.setdefault((_UNHASHABLE, str(value)), []).append(pos)
+            self._hash[key] = index
+        return index
+
+    def _text_index(self, key: str) -> dict:
+        index = self._text.get(key)
+        if index is None:
+            index = {}
+            for pos, item in enumerate(self.records):
+                index.setdefault(StringTools.xstr(item.get(key, None)), []).append(pos)
+            self._text[key] = index
+        return index
+
+    def _sorted_index(self, key: str) -> list:
+        index = self._sorted.get(key)
+        if index is None:
+            index = sorted(self._text_index(key))
+            self._sorted[key] = index
+        return index
+
+    def _numeric_index(self, key: str) -> tuple:
+        index = self._numeric.get(key)
+        if index is None:
+            positions = {}
+            for pos, item in enumerate(self.records):     # not from the hash index, where True and 1 share a key
+                value = item.get(key, None)
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                    positions.setdefault(value, []).append(pos)
+            index = (sorted(positions), positions)
+            self._numeric[key] = index
+        return index
+
+    def _kind(self, key: str) -> tuple[bool, bool]:
+        kind = self._kinds.get(key)
+        if kind is None:
+            present = all(key in item for item in self.records)
+            text = present and all(type(item[key]) is str for item in self.records)
+            kind = self._kinds[key] = (present, text)
+        return kind
+
+    def has_key(self, key: str) -> bool:
+        """True if every record has key, item[key] would not raise"""
+        return self._kind(key)[0]
+
+    def all_text(self, key: str) -> bool:
+        """True if every record has key with a str value, so 'value in item[key]' is a substring test"""
+        return self._kind(key)[1]
+
+    def _gram_index(self, key: str) -> dict:
+        index = self._grams.get(key)
+        if index is None:
+            index = {}
+            n = self.ngram
+            for text in self._text_index(key):
+                for i in range(len(text) - n + 1):
+                    index.setdefault(text[i:i + n], set()).add(text)
+            self._grams[key] = index
+        return index
+
+    # ---- lookups ----
+
+    def _collect(self, position_lists) -> list[dict]:
+        positions = []
+        for pos_list in position_lists:
+            positions.extend(pos_list)
+        positions.sort()
+        return [self.records[pos] for pos in positions]
+
+    def equal(self, key: str, value) -> list[dict]:
+        """Exact match, same semantics as value == item.get(key)"""
+        try:
+            return self._collect([self._hash_index(key).get(value, [])])
+        except TypeError:
+            return [item for item in self.records if value == item.get(key, None)]
+
+    def prefix(self, key: str, prefix: str) -> list[dict]:
+        """Items whose string value starts with prefix"""
+        texts = self._sorted_index(key)
+        index = self._text_index(key)
+        matches = []
+        for i in range(bisect.bisect_left(texts, prefix), len(texts)):
+            if not texts[i].startswith(prefix):
+                break
+            matches.append(index[texts[i]])
+        return self._collect(matches)
+
+    def range(self, key: str, low=None, high=None, inclusive: bool = True) -> list[dict]:
+        """
+        Items with low <= value <= high (or low <= value < high if not inclusive).
+        Numeric bounds search numeric values, string bounds search string values.
+        """
+        bound = low if low is not None else high
+        if isinstance(bound, str):
+            values = self._sorted_index(key)
+            index = self._text_index(key)
+        else:
+            values, index = self._numeric_index(key)
+        start = bisect.bisect_left(values, low) if low is not None else 0
+        if high is None:
+            end = len(values)
+        elif inclusive:
+            end = bisect.bisect_right(values, high)
+        else:
+            end = bisect.bisect_left(values, high)
+        return self._collect(index[value] for value in values[start:end])
+
+    def contains(self, key: str, substring: str) -> list[dict]:
+        """Items whose string value contains substring, same semantics as substring in xstr(item.get(key))"""
+        substring = StringTools.xstr(substring)
+        index = self._text_index(key)
+        n = self.ngram
+        if len(substring) < n:
+            candidates = index.keys()
+        else:
+            grams = self._gram_index(key)
+            candidates = None
+            for i in range(len(substring) - n + 1):
+                texts = grams.get(substring[i:i + n])
+                if not texts:
+                    return []
+                candidates = set(texts) if candidates is None else candidates & texts
+                if not candidates:
+                    return []
+        return self._collect(index[text] for text in candidates if substring in text)
+
+    def regex(self, key: str, pattern: str) -> list[dict]:
+        """Items whose string value matches pattern (re.search), pattern is compiled once"""
+        if re.escape(pattern) == pattern:  # no special characters, plain substring
+            return self.contains(key, pattern)
+        compiled = re.compile(pattern)
+        index = self._text_index(key)
+        return self._collect(index[text] for text in index if compiled.search(text))
+
+    def positions_matching(self, key: str, pattern: str) -> list[int]:
+        """Positions of items whose string value matches pattern"""
+        compiled = re.compile(pattern)
+        positions = []
+        for text, pos_list in self._text_index(key).items():
+            if compiled.search(text):
+                positions.extend(pos_list)
+        positions.sort()
+        return positions
+
+
+_FILTER_COMPARISONS = {'eq': '==', 'ne': '!=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+_FILTER_OPERATORS = frozenset(_FILTER_COMPARISONS) | {'in', 'not_in', 'regex', 'contains', 'between', 'exists'}
+_FILTER_ORDERING = {'gt': operator.gt, 'ge': operator.ge, 'lt': operator.lt, 'le': operator.le}
+
+
+def _text(value) -> str:
+    return '' if value is None else value if type(value) is str else str(value)
+
+
+def _is_in(value, values) -> bool:
+    try:
+        return value in values
+    except TypeError:   # unhashable record value against a set
+        return False
+
+
+def _compare(value, name: str, operand) -> bool:
+    """Range comparison that is False for None and for values not comparable with operand ('22' > 3)"""
+    if value is None:
+        return False
+    try:
+        if name == 'between':
+            return operand[0] <= value <= operand[1]
+        return _FILTER_ORDERING[name](value, operand)
+    except TypeError:
+        return False
+
+
+class RecordFilter:
+    """
+    Predicate compiled once from criteria into a single function, then evaluated once per record.
+    criteria is a dict, every entry must match:
+        {'model': 'MX67'}                       equality
+        {'model': {'in': ['MX67', 'MR33']}}     membership, 'not_in' for the opposite
+        {'name': re.compile('^store')}          regex search on the value as string, same as {'regex': '^store'}
+        {'name': {'contains': 'store'}}         substring of the value as string
+        {'port': {'ge': 1, 'lt': 10}}           eq, ne, gt, ge, lt, le and 'between': (low, high)
+        {'tags': {'exists': True}}              key present (or absent with False)
+        {'vlan': lambda value: ...}             any test on the value
+        {'or': [criteria, ...]}, {'and': [criteria, ...]}, {'not': criteria}
+    A missing key reads as None, range operators never match None or a value of another type ('22' vs 3).
+    Range comparisons are inlined; should one raise TypeError, the record is evaluated again with comparisons
+    that treat incomparable values as not matching.
+    """
+
+    def __init__(self, criteria: dict):
+        self.criteria = criteria
+        self._constants: dict = {}
+        self._safe = False
+        self._ordering = False
+        self.source = self._compile(criteria)
+        namespace = {'_text': _text, '_is_in': _is_in, '_compare': _compare}
+        fast = eval(f'lambda r: {self.source}', namespace | self._constants)
+        if not self._ordering:
+            self.predicate = fast
+            return
+        self._safe = True
+        safe = eval(f'lambda r: {self._compile(criteria)}', namespace | self._constants)
+
+        def predicate(record: dict) -> bool:
+            try:
+                return fast(record)
+            except TypeError:
+                return safe(record)
+        self.predicate = predicate
+
+    def __call__(self, record: dict) -> bool:
+        return self.predicate(record)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.criteria!r})'
+
+    def filter(self, records):
+        """Lazily yield matching records in order, each at most once"""
+        return filter(self.predicate, records)
+
+    def first(self, records, default=None):
+        return next(self.filter(records), default)
+
+    def _const(self, value) -> str:
+        """Name the generated code uses for value, values never end up in the source itself"""
+        name = f'c{len(self._constants)}'
+        self._constants[name] = value
+        return name
+
+    def _compile(self, criteria) -> str:
+        if isinstance(criteria, (list, tuple)):
+            return self._join([self._compile(item) for item in criteria], 'and')
+        parts = []
+        for key, value in criteria.items():
+            if key in ('and', 'or') and isinstance(value, (list, tuple)):
+                parts.append(self._join([self._compile(item) for item in value], key))
+            elif key == 'not' and isinstance(value, (dict, list, tuple)):
+                parts.append(f'not ({self._compile(value)})')
+            else:
+                parts.append(self._field(key, value))
+        return self._join(parts, 'and')
+
+    @staticmethod
+    def _join(parts: list[str], operator: str) -> str:
+        if not parts:
+            return 'True' if operator == 'and' else 'False'
+        return f' {operator} '.join(f'({part})' for part in parts)
+
+    def _field(self, key, value) -> str:
+        get = f'r.get({self._const(key)})'
+        if isinstance(value, re.Pattern):
+            return f'{self._const(value)}.search(_text({get})) is not None'
+        if isinstance(value, dict) and value and set(value) <= _FILTER_OPERATORS:
+            return self._join([self._operator(key, get, operator, operand)
+                               for operator, operand in value.items()], 'and')
+        if callable(value):
+            return f'{self._const(value)}({get})'
+        return f'{get} == {self._const(value)}'
+
+    def _operator(self, key, get: str, operator: str, operand) -> str:
+        if operator in ('eq', 'ne'):
+            return f'{get} {_FILTER_COMPARISONS[operator]} {self._const(operand)}'
+        if operator in _FILTER_COMPARISONS or operator == 'between':
+            self._ordering = True
+            if self._safe:
+                return f'_compare({get}, {operator!r}, {self._const(operand)})'
+        if operator in _FILTER_COMPARISONS:
+            return f'(v := {get}) is not None and v {_FILTER_COMPARISONS[operator]} {self._const(operand)}'
+        if operator == 'between':
+            low, high = operand
+            return f'(v := {get}) is not None and {self._const(low)} <= v <= {self._const(high)}'
+        if operator in ('in', 'not_in'):
+            try:
+                values = frozenset(operand)
+            except TypeError:
+                values = tuple(operand)
+            test = f'_is_in({get}, {self._const(values)})'
+            return test if operator == 'in' else f'not {test}'
+        if operator == 'regex':
+            pattern = operand if isinstance(operand, re.Pattern) else re.compile(StringTools.xstr(operand))
+            return f'{self._const(pattern)}.search(_text({get})) is not None'
+        if operator == 'contains':
+            return f'{self._const(StringTools.xstr(operand))} in _text({get})'
+        return f"{self._const(key)} {'in' if operand else 'not in'} r"   # exists
+
+
+def _key_getter(key):
+    """record -> key for a field name, a tuple of field names (composite key as tuple) or a function"""
+    if callable(key):
+        return key
+    if isinstance(key, (tuple, list)):
+        fields = tuple(key)
+        return lambda record: tuple([record.get(field, None) for field in fields])
+    return lambda record: record.get(key, None)
+
+
+def _is_null_key(key) -> bool:
+    """Missing join key, like SQL NULL it equals nothing: None, or a composite key with every part None"""
+    return key is None or (type(key) is tuple and len(key) > 0 and all(part is None for part in key))
 
 
 class DataHandler:
@@ -223,20 +1200,22 @@ class DataHandler:
         new_dict: dict = {}
         try:
             for dictionary in original_list:
-                new_dict[dictionary[key_str]] = item
+                new_dict[dictionary[key_str]] = dictionary
 
             return new_dict
         except KeyError as e:
-            log.error(f"{key_str} not a valid key. {e}")
+            log.error("%s not a valid key. %s", key_str, e)
             return {}
 
     @staticmethod
     def search_list_of_dicts_for_value_using_next(lst: list, value, key: str) -> dict:
         """Mostly here to keep Next() visible -- Will only find first available match"""
+        if isinstance(lst, IndexedRecords) and isinstance(value, str) and lst.all_text(key):
+            return next(iter(lst.contains(key, value)), {})
         try:
-            item = next((lst[item] for item in lst if value in list[item][key]), {})
+            item = next((item for item in lst if value in item[key]), {})
         except KeyError as e:
-            log.error(f'Keyerror: {key}, {e}')
+            log.error('Keyerror: %s, %s', key, e)
             item = {}
         return item
 
@@ -247,22 +1226,42 @@ class DataHandler:
         Value can be reg expression - CASE SENSITIVE
         """
         value = RTB.xstr(value)  # allow user to enter digits, allows search for None type objects
-        output = [item for item in lst if re.findall(value, RTB.xstr(item[key], ''))]
+        if isinstance(lst, IndexedRecords) and lst.has_key(key):
+            return lst.regex(key, value)
+        pattern = re.compile(value)
+        output = [item for item in lst if pattern.search(RTB.xstr(item[key], ''))]
         return output
 
     @staticmethod
     def search_list_of_dicts_for_string_by_dict(lst: list[dict], parameters: dict) -> list:
-        output = []
-        for item in lst:
+        """Items where any key's value matches its regex, each item listed once"""
+        if isinstance(lst, IndexedRecords):
+            positions = set()
             for k, v in parameters.items():
-                if re.findall(v, RTB.xstr(item[k], '')):
-                    output.append(item)
-                    continue
-        return output
+                positions.update(lst.positions_matching(k, v))
+            return [lst[pos] for pos in sorted(positions)]
+        record_filter = RecordFilter({'or': [{k: {'regex': v}} for k, v in parameters.items()]})
+        return list(record_filter.filter(lst))
+
+    @staticmethod
+    def compile_filter(criteria: dict) -> RecordFilter:
+        """Compile criteria once for reuse, see RecordFilter for the syntax"""
+        return RecordFilter(criteria)
+
+    @staticmethod
+    def filter_list_of_dicts(lst, criteria: dict or RecordFilter):
+        """
+        Lazily yield the items matching criteria (equality, in, regex, ranges, and/or/not), each once,
+        in one pass over lst. See RecordFilter for the syntax.
+        """
+        record_filter = criteria if isinstance(criteria, RecordFilter) else RecordFilter(criteria)
+        return record_filter.filter(lst)
 
     @staticmethod
     def search_list_of_dicts_for_string_using_in(lst: list, value: str, key: str) -> list:
         """ FInd list items using keyword/values. Can be used to find partial string values."""
+        if isinstance(lst, IndexedRecords) and isinstance(value, str):
+            return lst.contains(key, value)
         output = []
         for item in lst:
             if value in RTB.xstr(item.get(key, None)):
@@ -272,12 +1271,102 @@ class DataHandler:
     @staticmethod
     def search_list_of_dicts_for_value_using_equality(lst: list, value: str or int or float, key: str) -> list:
         """Find list items using keyword/values.  Find EXACT strings/int/float"""
+        if isinstance(lst, IndexedRecords):
+            return lst.equal(key, value)
         output = []
         for item in lst:
             if value == item.get(key, None):  # <removed xstr
                 output.append(item)
         return output
 
+    @staticmethod
+    def index_by(records, key) -> dict:
+        """
+        {key: record} in one pass, later duplicates replace earlier ones.
+        key: field name, tuple of field names (tuple keys) or function record -> key. Missing fields read as None.
+        """
+        get_key = _key_getter(key)
+        return {get_key(record): record for record in records}
+
+    @staticmethod
+    def group_by(records, key) -> dict[object, list]:
+        """{key: [records]} in one pass, records keep their order within a group. key as in index_by"""
+        get_key = _key_getter(key)
+        groups: dict = {}
+        for record in records:
+            group_key = get_key(record)
+            group = groups.get(group_key)
+            if group is None:
+                groups[group_key] = [record]
+            else:
+                group.append(record)
+        return groups
+
+    @staticmethod
+    def hash_join(left, right, left_key, right_key=None, how: str = 'inner', merge: bool = True,
+                  right_prefix: str = ''):
+        """
+        Join two record iterables on equal keys: right is hashed once, left is streamed.
+        :param left: iterable of dicts, may be a generator
+        :param right: iterable of dicts, read into a hash table
+        :param left_key: field name, tuple of field names or function, see index_by
+        :param right_key: same for right, default left_key
+        :param how: 'inner' or 'left' (left records without a match are kept, joined with nothing/None)
+            A missing key (None, or all None for composite keys) matches nothing, like SQL NULL
+        :param merge: yield merged dicts {**left, **right}, or (left, right) tuples if False
+        :param right_prefix: prefix right field names in merged dicts, e.g. 'network_'
+        :return: generator, one item per matching pair in left order
+        """
+        if how not in ('inner', 'left'):
+            raise ValueError(f"Unknown join '{how}', use 'inner' or 'left'")
+        return DataHandler._hash_join(left, right, left_key, right_key, how, merge, right_prefix)
+
+    @staticmethod
+    def _hash_join(left, right, left_key, right_key, how: str, merge: bool, right_prefix: str):
+        get_left = _key_getter(left_key)
+        get_right = _key_getter(right_key if right_key is not None else left_key)
+        table: dict = {}
+        for match in right:
+            key = get_right(match)
+            if not _is_null_key(key):
+                table.setdefault(key, []).append(match)
+        for record in left:
+            key = get_left(record)
+            matches = None if _is_null_key(key) else table.get(key)
+            if matches is None:
+                if how == 'left':
+                    yield dict(record) if merge else (record, None)
+                continue
+            for match in matches:
+                if not merge:
+                    yield record, match
+                elif right_prefix:
+                    yield {**record, **{f'{right_prefix}{k}': v for k, v in match.items()}}
+                else:
+                    yield {**record, **match}
+
+    @staticmethod
+    def dedupe_by(records, key, keep: str = 'first'):
+        """
+        Yield one record per key, key as in index_by.
+        keep='first' streams and yields as it goes, keep='last' has to read all records first.
+        """
+        if keep not in ('first', 'last'):
+            raise ValueError(f"Unknown keep '{keep}', use 'first' or 'last'")
+        return DataHandler._dedupe_by(records, _key_getter(key), keep)
+
+    @staticmethod
+    def _dedupe_by(records, get_key, keep: str):
+        if keep == 'last':
+            yield from DataHandler.index_by(records, get_key).values()
+            return
+        seen = set()
+        for record in records:
+            record_key = get_key(record)
+            if record_key not in seen:
+                seen.add(record_key)
+                yield record
+
     @staticmethod
     def choose_from_list(choices: list, prompt: str = "Choose number from list: ", offset: int = 0):
         print(prompt)
@@ -1,10 +1,32 @@
+import datetime
+import itertools
 import xlsxwriter
 import xlsxwriter.worksheet
 from dataclasses import dataclass, field
 
+MAX_ROWS = 1_048_576    # xlsx row limit per worksheet, header included
+
 
 @dataclass
 class SingleReport:
+    """
+    Single table xlsx report.
+    output_format: {column name: options} in column order, options (all optional):
+        'header': dict merged into the column header options, 'header' key overrides the header text
+        'col_width': column width, default 10
+        'format': xlsxwriter cell format dict for the column
+        'key': field to read from dict rows, default is the column name
+    results: dict of rows (written in sorted key order) or any iterable/generator of rows.
+        A row is a dict, a list/tuple in column order, or a list of dict rows.
+    Rows are streamed with xlsxwriter's constant_memory mode, so only the current row is held in memory.
+    Past max_rows a new worksheet '<sheetname>_2', '_3', ... is started with its own header.
+
+    columnar=True: results is {key: list of values}, a pandas DataFrame or a pyarrow Table (detected
+    automatically). Columns are zipped straight into the row stream, no per row dicts are built.
+    With table=True they are instead written in bulk with write_column under an add_table header, which
+    needs the default (non constant_memory) workbook mode and is slower to save.
+    Without a 'col_width', widths are sized from a sample of up to width_sample values per column.
+    """
     filename: str
     output_format: dict
     results: dict
@@ -12,20 +34,204 @@ class SingleReport:
     sheetname: str = 'Results'
     wb: xlsxwriter.Workbook = field(default=None, repr=False)
     ws: xlsxwriter.worksheet.Worksheet = None
+    constant_memory: bool = True
+    max_rows: int = MAX_ROWS
+    header_format: dict = field(default_factory=lambda: {'bold': True})
+    sheets: list = field(default_factory=list, repr=False)
+    rows_written: int = 0
+    columnar: bool = False
+    table: bool = False
+    table_style: str = 'Table Style Light 9'
+    auto_width: bool = True
+    width_sample: int = 1000
+    max_col_width: int = 60
 
     def __post_init__(self):
-        self.wb = xlsxwriter.Workbook()
-        self.ws = self.wb.add_worksheet(self.sheetname)
+        self.filename = self.report_filename()
+        self._columns = list(self.output_format.keys())
+        self._keys = [self.output_format[col].get('key', col) for col in self._columns]
+        if self._is_frame(self.results):
+            self.columnar = True
+        if self.columnar:
+            self.results = self._to_columns(self.results)
+            if self.table:
+                self.constant_memory = False
+        self.wb = xlsxwriter.Workbook(self.filename, {'constant_memory': self.constant_memory,
+                                                      'nan_inf_to_errors': True})
+        self._formats = [self.wb.add_format(self.output_format[col]['format'])
+                         if self.output_format[col].get('format') else None for col in self._columns]
+        self._header_format = self.wb.add_format(self.header_format) if self.header_format else None
+        self._widths = self._column_widths()
+        self._row = 0
+        self.ws = self._add_sheet(header=not (self.columnar and self.table))
 
-    def set_format(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def report_filename(self) -> str:
+        """filename with .xlsx extension, dated as name_YY_MM_DD like FileHandler.date_filename"""
+        filename = self.filename[:-5] if self.filename.endswith('.xlsx') else self.filename
+        if self.dated:
+            filename = f"{filename}_{datetime.date.today().strftime('%y_%m_%d')}"
+        return filename + '.xlsx'
+
+    def _add_sheet(self, header: bool = True) -> xlsxwriter.worksheet.Worksheet:
+        name = self.sheetname if not self.sheets else f'{self.sheetname}_{len(self.sheets) + 1}'
+        self.ws = self.wb.add_worksheet(name)
+        self.sheets.append(self.ws)
+        self.set_format()
+        if header:
+            self._write_header()
+        else:
+            self._row = 1
+        return self.ws
+
+    @staticmethod
+    def _is_frame(results) -> bool:
+        """pandas DataFrame or pyarrow Table, checked without importing either"""
+        module = type(results).__module__
+        return (module.startswith('pandas') and hasattr(results, 'columns')) or \
+            (module.startswith('pyarrow') and hasattr(results, 'column_names'))
+
+    @staticmethod
+    def _to_columns(results) -> dict[str, list]:
+        module = type(results).__module__
+        if module.startswith('pandas'):
+            return {str(col): results[col].tolist() for col in results.columns}
+        if module.startswith('pyarrow'):
+            return {name: results.column(name).to_pylist() for name in results.column_names}
+        return results
+
+    def _sample(self, key) -> list:
+        """Up to width_sample values of one column, evenly spread"""
+        if self.columnar:
+            values = self.results.get(key, [])
+            step = max(1, len(values) // self.width_sample)
+            return values[::step][:self.width_sample]
+        if isinstance(self.results, (dict, list)):
+            rows = self.results.values() if isinstance(self.results, dict) else self.results
+            sample = []
+            for row in rows:
+                for item in (row if isinstance(row, list) and row and isinstance(row[0], dict) else [row]):
+                    if isinstance(item, dict):
+                        sample.append(item.get(key, None))
+                if len(sample) >= self.width_sample:
+                    break
+            return sample
+        return []
+
+    def _column_widths(self) -> list[float]:
+        widths = []
+        for col, key, head in zip(self._columns, self._keys, self.headers()):
+            width = self.output_format[col].get('col_width', None)
+            if width is None and self.auto_width:
+                sample = self._sample(key)
+                if sample:
+                    longest = max(len('' if value is None else str(value)) for value in sample)
+                    width = min(self.max_col_width, max(longest, len(str(head['header']))) + 2)
+            widths.append(width if width is not None else 10)
+        return widths
+
+    def headers(self) -> list[dict]:
         columns = []
-        for enum, col in enumerate(self.output_format.keys()):
+        for col in self._columns:
             head = {'header': col}
             update = self.output_format[col].get('header', {})
             head |= update
             columns.append(head)
-            self.ws.set_column(enum, enum, self.output_format[col].get('col_width', 10))
+        return columns
+
+    def set_format(self):
+        for enum, width in enumerate(self._widths):
+            self.ws.set_column(enum, enum, width)
+
+    def _write_header(self):
+        self.ws.write_row(0, 0, [head['header'] for head in self.headers()], self._header_format)
+        self._row = 1
+
+    def _rows(self, results):
+        """Flatten results into single rows"""
+        rows = (results[key] for key in sorted(results.keys())) if isinstance(results, dict) else results
+        for row in rows:
+            if isinstance(row, list) and row and isinstance(row[0], dict):
+                yield from row
+            else:
+                yield row
+
+    def _values(self, row) -> list:
+        if isinstance(row, dict):
+            return [row.get(key, None) for key in self._keys]
+        return list(row)
+
+    def write_row(self, row) -> None:
+        if self._row >= self.max_rows:
+            self._add_sheet()
+        ws = self.ws
+        r = self._row
+        for c, (value, cell_format) in enumerate(zip(self._values(row), self._formats)):
+            value_type = type(value)
+            if value_type is str:   # common types skip worksheet.write()'s type dispatch
+                ws.write_string(r, c, value, cell_format)
+            elif value_type is int or value_type is float:
+                ws.write_number(r, c, value, cell_format)
+            elif value is None:
+                if cell_format is not None:
+                    ws.write_blank(r, c, None, cell_format)
+            elif isinstance(value, (list, dict, tuple, set)):
+                ws.write_string(r, c, str(value), cell_format)
+            else:
+                ws.write(r, c, value, cell_format)
+        self._row += 1
+        self.rows_written += 1
+
+    def set_values(self, rows=None):
+        """Write results (or the given rows) after the rows already written"""
+        for row in self._rows(self.results if rows is None else rows):
+            self.write_row(row)
+
+    @staticmethod
+    def _cell_values(values: list) -> list:
+        return [str(value) if isinstance(value, (list, dict, tuple, set)) else value for value in values]
+
+    def write_columns(self, columns: dict = None):
+        """Write columnar results (or the given columns), as a row stream or with write_column/add_table"""
+        columns = self._to_columns(self.results if columns is None else columns)
+        if not self.table:
+            for row in itertools.zip_longest(*(columns.get(key, ()) for key in self._keys)):
+                self.write_row(row)
+            return
+        data = [self._cell_values(list(columns.get(key, []))) for key in self._keys]
+        total = max((len(values) for values in data), default=0)
+        per_sheet = self.max_rows - 1
+        for start in range(0, max(total, 1), per_sheet):
+            if start:
+                self._add_sheet(header=not self.table)
+            count = min(per_sheet, total - start)
+            for c, (values, cell_format) in enumerate(zip(data, self._formats)):
+                self.ws.write_column(1, c, values[start:start + count], cell_format)
+            if self.table:
+                headers = self.headers()
+                for head, cell_format in zip(headers, self._formats):
+                    if cell_format is not None:
+                        head.setdefault('format', cell_format)
+                    if self._header_format is not None:
+                        head.setdefault('header_format', self._header_format)
+                options = {'columns': headers, 'style': self.table_style, 'name': self.ws.name.replace(' ', '_')}
+                self.ws.add_table(0, 0, max(count, 1), len(self._columns) - 1, options)
+            self._row = count + 1
+            self.rows_written += count
+
+    def close(self):
+        self.wb.close()
 
-    def set_values(self):
-        for network in sorted(self.results.keys()):
-            pass
\ No newline at end of file
+    def save(self) -> str:
+        """Write all results and close the workbook, returns the filename"""
+        if self.columnar:
+            self.write_columns()
+        else:
+            self.set_values()
+        self.close()
+        return self.filename